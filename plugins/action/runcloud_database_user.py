@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+from ansible_collections.danni140c.runcloud.plugins.plugin_utils.runcloud import (
+    RunCloudActionModule,
+)
+
+
+class ActionModule(RunCloudActionModule):
+    pass
@@ -35,6 +35,54 @@ options:
     - The timeout in seconds used for polling RunCloud's API.
     type: int
     default: 120
+  concurrency:
+    description:
+    - The maximum number of requests sent to RunCloud's API in parallel.
+    - Used when fetching the remaining pages of a paginated listing, and by the modules that manage many
+      resources in one task to bound the creates, deletes, grants, SSL changes, settings updates and
+      installation scripts run at the same time.
+    - Work started from one of those parallel requests, such as paging through the listing of every server,
+      runs on the same workers, so the limit holds for the whole task.
+    - Set to V(1) to send requests one at a time.
+    type: int
+    default: 4
+  retries:
+    description:
+    - Number of times a request is retried after a connection failure, a timeout or a 5xx answer.
+    - Only idempotent requests are retried, with exponential backoff and jitter between attempts.
+    type: int
+    default: 3
+  retry_call_budget:
+    description:
+    - Maximum number of seconds a single request may spend sleeping between retries before giving up.
+    - The time spent waiting for the failed attempts themselves, up to O(timeout) each, is not counted.
+    type: int
+    default: 60
+  retry_budget:
+    description:
+    - Maximum number of seconds a module run may spend sleeping between retries across all of its requests.
+    type: int
+    default: 300
+  rate_limit:
+    description:
+    - Maximum number of requests per minute sent to RunCloud's API.
+    - The budget is shared by every module running on the controller with the same credentials.
+    - Requests answered with HTTP 429 are retried after the delay given in the C(Retry-After) header.
+    - Set to V(0) to disable client-side rate limiting.
+    type: int
+    default: 60
+  id_cache_ttl:
+    description:
+    - Number of seconds a name to ID resolution is kept in the on-disk ID cache.
+    - The cache is shared by all forks on the controller and is invalidated when a module creates, changes or deletes a resource.
+    - Set to V(0) to disable the cache.
+    type: int
+    default: 300
+  id_cache_path:
+    description:
+    - Path of the on-disk ID cache file.
+    type: path
+    default: ~/.ansible/tmp/runcloud_id_cache.json
 """
 
     SERVER_DOCUMENTATION = r"""
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: runcloud
+
+short_description: RunCloud servers inventory source
+
+version_added: "0.0.11"
+
+description:
+    - Builds the inventory from the servers of a RunCloud account.
+    - Every host gets its RunCloud server ID, provider, connection state and PHP CLI version as host variables,
+      so that later tasks can pass O(danni140c.runcloud.runcloud_ssl#module:server_id) without any lookup.
+    - Uses a YAML configuration file that ends with C(runcloud.yml) or C(runcloud.yaml).
+
+author:
+    - Daniel Rasmussen (@danni140c)
+
+extends_documentation_fragment:
+    - constructed
+    - inventory_cache
+
+options:
+    plugin:
+        description: The name of this plugin, it should always be set to V(danni140c.runcloud.runcloud).
+        required: true
+        choices: ["danni140c.runcloud.runcloud"]
+    base_url:
+        description: RunCloud API base url.
+        type: str
+        default: https://manage.runcloud.io/api/v2
+    api_key:
+        description: RunCloud API key.
+        type: str
+        env:
+            - name: RC_API_KEY
+            - name: RUNCLOUD_API_KEY
+    api_secret:
+        description: RunCloud API secret.
+        type: str
+        env:
+            - name: RC_API_SECRET
+            - name: RUNCLOUD_API_SECRET
+    timeout:
+        description: The timeout in seconds used for polling RunCloud's API.
+        type: int
+        default: 120
+    concurrency:
+        description: The maximum number of listing pages fetched in parallel.
+        type: int
+        default: 4
+    hostnames:
+        description:
+            - The server attribute used as inventory hostname.
+            - V(ip_address) sets the hostname to the server's IP address.
+        type: str
+        choices: ["name", "ip_address"]
+        default: name
+    group_by_provider:
+        description: Add hosts to a C(runcloud_provider_<provider>) group.
+        type: bool
+        default: false
+    group_by_php_version:
+        description: Add hosts to a C(runcloud_php_<version>) group, e.g. C(runcloud_php_8_1).
+        type: bool
+        default: false
+"""
+
+EXAMPLES = r"""
+# runcloud.yml
+plugin: danni140c.runcloud.runcloud
+group_by_provider: true
+group_by_php_version: true
+cache: true
+cache_plugin: ansible.builtin.jsonfile
+cache_connection: ~/.cache/ansible/runcloud
+cache_timeout: 3600
+keyed_groups:
+  - key: runcloud_provider
+    prefix: provider
+"""
+
+from ansible.inventory.group import to_safe_group_name
+from ansible.plugins.inventory import BaseInventoryPlugin, Cacheable, Constructable
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    RunCloudHelper,
+)
+from ansible_collections.danni140c.runcloud.plugins.plugin_utils.runcloud import (
+    runcloud_helper,
+)
+
+
+class InventoryModule(BaseInventoryPlugin, Constructable, Cacheable):
+    NAME = "danni140c.runcloud.runcloud"
+
+    php_cli_versions = dict(
+        (value, key) for key, value in RunCloudHelper.php_versions.items()
+    )
+
+    def verify_file(self, path):
+        return super(InventoryModule, self).verify_file(path) and path.endswith(
+            ("runcloud.yml", "runcloud.yaml")
+        )
+
+    def _fetch_servers(self):
+        rest = runcloud_helper(
+            self.NAME,
+            base_url=self.get_option("base_url"),
+            api_key=self.get_option("api_key"),
+            api_secret=self.get_option("api_secret"),
+            timeout=self.get_option("timeout"),
+            concurrency=self.get_option("concurrency"),
+        )
+        try:
+            return rest.get_all_pages("servers")
+        finally:
+            # Ansible forks its workers from this process afterwards, so
+            # do not leave a kept-alive connection behind.
+            rest.pool.close()
+
+    def _hostvars(self, server):
+        php_cli_version = server.get("phpCLIVersion")
+        return dict(
+            ansible_host=server.get("ipAddress"),
+            runcloud_server_id=server.get("id"),
+            runcloud_server_name=server.get("name"),
+            runcloud_provider=server.get("provider"),
+            runcloud_connected=server.get("connected"),
+            runcloud_online=server.get("online"),
+            runcloud_php_cli_version=self.php_cli_versions.get(php_cli_version, php_cli_version),
+        )
+
+    def _populate(self, servers):
+        strict = self.get_option("strict")
+        hostname_key = "ipAddress" if self.get_option("hostnames") == "ip_address" else "name"
+        self.inventory.add_group("runcloud")
+
+        for server in servers:
+            hostname = server.get(hostname_key)
+            if not hostname:
+                continue
+
+            self.inventory.add_host(hostname, group="runcloud")
+            hostvars = self._hostvars(server)
+            for key, value in hostvars.items():
+                self.inventory.set_variable(hostname, key, value)
+
+            if self.get_option("group_by_provider") and hostvars["runcloud_provider"]:
+                group = self.inventory.add_group(
+                    to_safe_group_name("runcloud_provider_%s" % hostvars["runcloud_provider"])
+                )
+                self.inventory.add_child(group, hostname)
+
+            if self.get_option("group_by_php_version") and hostvars["runcloud_php_cli_version"]:
+                group = self.inventory.add_group(
+                    to_safe_group_name("runcloud_php_%s" % hostvars["runcloud_php_cli_version"].replace(".", "_"))
+                )
+                self.inventory.add_child(group, hostname)
+
+            self._set_composite_vars(self.get_option("compose"), hostvars, hostname, strict=strict)
+            self._add_host_to_composed_groups(self.get_option("groups"), hostvars, hostname, strict=strict)
+            self._add_host_to_keyed_groups(self.get_option("keyed_groups"), hostvars, hostname, strict=strict)
+
+    def parse(self, inventory, loader, path, cache=True):
+        super(InventoryModule, self).parse(inventory, loader, path, cache)
+        self._read_config_data(path)
+
+        cache_key = self.get_cache_key(path)
+        user_cache_setting = self.get_option("cache")
+        attempt_to_read_cache = user_cache_setting and cache
+        cache_needs_update = user_cache_setting and not cache
+
+        servers = None
+        if attempt_to_read_cache:
+            try:
+                servers = self._cache[cache_key]
+            except KeyError:
+                cache_needs_update = True
+
+        if servers is None:
+            servers = self._fetch_servers()
+
+        if cache_needs_update:
+            self._cache[cache_key] = servers
+
+        self._populate(servers)
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+name: runcloud
+
+short_description: Resolve RunCloud resources to IDs or objects
+
+version_added: "0.0.11"
+
+description:
+    - Resolves hierarchical paths of RunCloud resource names, such as C(server/webapp/domain), to IDs or full objects.
+    - The first path element is a server name, the second one a resource on that server selected with O(type)
+      and the third one a domain of that web application.
+    - Results are memoized per playbook run and per set of credentials, so the same lookup used in many tasks
+      costs one round trip to the API.
+
+author:
+    - Daniel Rasmussen (@danni140c)
+
+options:
+    _terms:
+        description: Paths of names to resolve, separated by C(/).
+        required: true
+        type: list
+        elements: str
+    type:
+        description: The kind of resource the second path element names.
+        type: str
+        choices: ["webapp", "user", "database", "database_user"]
+        default: webapp
+    output:
+        description:
+            - V(id) returns the ID of the last path element.
+            - V(object) returns the full object of the last path element.
+        type: str
+        choices: ["id", "object"]
+        default: id
+    base_url:
+        description: RunCloud API base url.
+        type: str
+        default: https://manage.runcloud.io/api/v2
+    api_key:
+        description: RunCloud API key.
+        type: str
+        env:
+            - name: RC_API_KEY
+            - name: RUNCLOUD_API_KEY
+    api_secret:
+        description: RunCloud API secret.
+        type: str
+        env:
+            - name: RC_API_SECRET
+            - name: RUNCLOUD_API_SECRET
+    timeout:
+        description: The timeout in seconds used for polling RunCloud's API.
+        type: int
+        default: 120
+"""
+
+EXAMPLES = r"""
+- name: Install SSL on a web application resolved once for the whole play
+  danni140c.runcloud.runcloud_ssl:
+    server_id: "{{ lookup('danni140c.runcloud.runcloud', 'My Server') }}"
+    webapp_id: "{{ lookup('danni140c.runcloud.runcloud', 'My Server/my-webapp') }}"
+
+- name: Get the ID of a domain
+  ansible.builtin.debug:
+    msg: "{{ lookup('danni140c.runcloud.runcloud', 'My Server/my-webapp/example.com') }}"
+
+- name: Get the full object of a database user
+  ansible.builtin.debug:
+    msg: "{{ lookup('danni140c.runcloud.runcloud', 'My Server/db_user', type='database_user', output='object') }}"
+"""
+
+RETURN = r"""
+_raw:
+    description: The ID or the object of the last element of each path.
+    type: list
+"""
+
+import errno
+import json
+import multiprocessing
+import os
+
+from ansible.errors import AnsibleError
+from ansible.plugins.lookup import LookupBase
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    HAS_FCNTL,
+    RunCloudHelper,
+    credentials_scope,
+    locked_json_state,
+)
+from ansible_collections.danni140c.runcloud.plugins.plugin_utils.runcloud import (
+    runcloud_helper,
+)
+
+# Lookups resolved by this process, keyed by credentials and query
+_MEMO = {}
+
+
+def run_id():
+    """
+    ID of the current ansible run: the PID of the main ansible process,
+    which is also the parent of every worker process.
+    """
+    parent_process = getattr(multiprocessing, "parent_process", lambda: None)()
+    if parent_process is not None:
+        return parent_process.pid
+    return os.getpid()
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM means the process exists but belongs to another user.
+        return e.errno != errno.ESRCH
+    return True
+
+
+class RunMemo(object):
+    """
+    Lookup results shared by all worker processes of one ansible run,
+    kept in a state file next to the RunCloud ID cache, readable by its
+    owner only. Entries of runs that have ended are dropped on every
+    write.
+    """
+
+    def __init__(self):
+        self.run_id = str(run_id())
+        self.path = os.path.join(
+            os.path.expanduser(RunCloudHelper.state_dir), "runcloud_lookup_memo.json"
+        )
+
+    def get(self, key):
+        if not HAS_FCNTL:
+            return None
+        try:
+            return locked_json_state(self.path).get(self.run_id, {}).get(key)
+        except (IOError, OSError):
+            return None
+
+    def set(self, key, value):
+        if not HAS_FCNTL:
+            return
+
+        def update(state):
+            for other_run in [run for run in state if run != self.run_id and not pid_alive(int(run))]:
+                del state[other_run]
+            state.setdefault(self.run_id, {})[key] = value
+
+        try:
+            locked_json_state(self.path, update)
+        except (IOError, OSError):
+            pass
+
+
+class LookupModule(LookupBase):
+    resource_types = dict(
+        [
+            ("webapp", ("webapps", "name")),
+            ("user", ("users", "username")),
+            ("database", ("databases", "name")),
+            ("database_user", ("databaseusers", "username")),
+        ]
+    )
+
+    def _resolve(self, rest, names, resource_type, output):
+        levels = [("servers", "name"), self.resource_types[resource_type], ("domains", "name")]
+        if len(names) > 3 or (len(names) == 3 and resource_type != "webapp"):
+            raise AnsibleError(
+                "Invalid path %s: domains can only be looked up below a web application." % "/".join(names)
+            )
+
+        parent = None
+        url = None
+        entity = None
+        for (collection, name_key), name in zip(levels, names):
+            url = "%s/%s" % (parent, collection) if parent else collection
+            entity = rest.find_entity(url=url, name_key=name_key, id_key="id", name_value=name)
+            if entity is None:
+                raise AnsibleError("Failed to find %s in %s." % (name, url))
+            parent = "%s/%s" % (url, entity.get("id"))
+
+        if output == "object":
+            entity = rest.get_entity(url, entity.get("id"))
+            return entity
+
+        return entity.get("id")
+
+    def run(self, terms, variables=None, **kwargs):
+        self.set_options(var_options=variables, direct=kwargs)
+        options = dict(
+            base_url=self.get_option("base_url"),
+            api_key=self.get_option("api_key"),
+            api_secret=self.get_option("api_secret"),
+            timeout=self.get_option("timeout"),
+        )
+        resource_type = self.get_option("type")
+        output = self.get_option("output")
+        scope = credentials_scope(options["base_url"], "%s:%s" % (options["api_key"], options["api_secret"]))
+
+        memo = RunMemo()
+        rest = None
+        results = []
+        for term in terms:
+            names = [name for name in term.strip("/").split("/") if name]
+            if not names:
+                raise AnsibleError("Empty RunCloud lookup path.")
+
+            key = json.dumps([scope, names, resource_type, output])
+            if key not in _MEMO:
+                value = memo.get(key)
+                if value is None:
+                    if rest is None:
+                        rest = runcloud_helper("danni140c.runcloud.runcloud", **options)
+                    value = self._resolve(rest, names, resource_type, output)
+                    memo.set(key, value)
+                _MEMO[key] = value
+            results.append(_MEMO[key])
+
+        return results
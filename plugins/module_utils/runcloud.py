@@ -8,35 +8,536 @@ from __future__ import absolute_import, division, print_function
 
 __metaclass__ = type
 
+import base64
+import hashlib
+import io
 import json
-from ansible.module_utils._text import to_text
+import math
+import os
+import random
+import re
+import socket
+import ssl
+import threading
+import time
+import zlib
+from datetime import datetime
+from email.utils import mktime_tz, parsedate_tz
+from ansible.module_utils._text import to_bytes, to_native, to_text
 from ansible.module_utils.basic import env_fallback
+from ansible.module_utils.six.moves import http_client
+from ansible.module_utils.six.moves.urllib.parse import urlencode, urlparse
+from ansible.module_utils.six.moves.urllib.request import getproxies
 from ansible.module_utils.urls import fetch_url
 
+try:
+    from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+    HAS_FUTURES = True
+except ImportError:
+    HAS_FUTURES = False
+
+try:
+    import fcntl
+    HAS_FCNTL = True
+except ImportError:
+    HAS_FCNTL = False
+
 class Response(object):
-    def __init__(self, resp, info):
+    """
+    API response whose JSON body is decoded once, on first access. The raw
+    bytes are dropped after decoding. When `fields` is given, the entities
+    of a listing's "data" are projected down to those keys.
+
+    gzip and deflate bodies are decompressed chunk by chunk as they are
+    read. Bodies that turn out not to be compressed, e.g. because the
+    transport already decompressed them, are kept as they are.
+    """
+
+    __slots__ = ("body", "info", "fields", "size", "_json", "_decoded")
+
+    chunk_size = 64 * 1024
+    decoders = dict(
+        [
+            ("gzip", (16 + zlib.MAX_WBITS,)),
+            ("x-gzip", (16 + zlib.MAX_WBITS,)),
+            ("deflate", (zlib.MAX_WBITS, -zlib.MAX_WBITS)),
+        ]
+    )
+
+    def __init__(self, resp, info, fields=None):
         self.body = None
-        if resp:
-            self.body = resp.read()
+        self.size = 0
         self.info = info
+        encoding = info.get("content-encoding", "").lower()
+        if resp:
+            self.body = self._read(resp, encoding)
+        elif info.get("body"):
+            info["body"] = self._read(io.BytesIO(info["body"]), encoding)
+        self.fields = fields
+        self._json = None
+        self._decoded = False
 
-    @property
-    def json(self):
-        if not self.body:
-            if "body" in self.info:
-                return json.loads(to_text(self.info["body"]))
-            return None
+    def _read(self, stream, encoding):
+        first = stream.read(self.chunk_size)
+        self.size += len(first)
+        chunks = None
+        for wbits in self.decoders.get(encoding, ()):
+            decompressor = zlib.decompressobj(wbits)
+            try:
+                chunks = [decompressor.decompress(first)]
+                break
+            except zlib.error:
+                continue
+
+        if chunks is None:
+            rest = stream.read()
+            self.size += len(rest)
+            return first + rest
+
+        chunk = stream.read(self.chunk_size)
+        while chunk:
+            self.size += len(chunk)
+            chunks.append(decompressor.decompress(chunk))
+            chunk = stream.read(self.chunk_size)
+        chunks.append(decompressor.flush())
+        return b"".join(chunks)
+
+    def _decode(self):
+        body = self.body
+        if not body:
+            body = self.info.pop("body", None)
+            if body is None:
+                return None
         try:
-            return json.loads(to_text(self.body))
+            decoded = json.loads(to_text(body))
         except ValueError:
             return None
 
+        if self.fields and isinstance(decoded, dict) and isinstance(decoded.get("data"), list):
+            decoded["data"] = [
+                dict((key, entity[key]) for key in self.fields if key in entity)
+                for entity in decoded["data"]
+            ]
+        return decoded
+
+    @property
+    def json(self):
+        if not self._decoded:
+            self._json = self._decode()
+            self._decoded = True
+            self.body = None
+        return self._json
+
     @property
     def status_code(self):
         return self.info["status"]
 
+class ConnectionPool(object):
+    """
+    Keep-alive HTTP(S) connections, one per host, thread and process,
+    reused for every request of a module run. A process forked after the
+    pool was used starts with no connections rather than sharing the
+    parent's sockets.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def _connections(self):
+        if getattr(self._local, "pid", None) != os.getpid():
+            self._local.pid = os.getpid()
+            self._local.connections = {}
+        return self._local.connections
+
+    def _connection(self, scheme, netloc, timeout):
+        connections = self._connections()
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            if scheme == "https":
+                connection = http_client.HTTPSConnection(
+                    netloc, timeout=timeout, context=ssl.create_default_context()
+                )
+            else:
+                connection = http_client.HTTPConnection(netloc, timeout=timeout)
+            connections[(scheme, netloc)] = connection
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def _discard(self, scheme, netloc):
+        connection = self._connections().pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+
+    def request(self, method, url, data, headers, timeout):
+        """
+        Send a request and return (resp, info) with the same semantics as
+        fetch_url: resp is None and the body is in info["body"] for HTTP
+        errors, and info["status"] is -1 when no response was received.
+        """
+        parts = urlparse(url)
+        target = parts.path
+        if parts.query:
+            target = "%s?%s" % (target, parts.query)
+
+        while True:
+            connection = self._connection(parts.scheme, parts.netloc, timeout)
+            reused = connection.sock is not None
+            try:
+                connection.request(method, target, body=data, headers=headers)
+                http_response = connection.getresponse()
+                body = http_response.read()
+                break
+            except (http_client.HTTPException, socket.error) as e:
+                self._discard(parts.scheme, parts.netloc)
+                # A kept-alive connection may have been closed by the server
+                # in the meantime, so retry once on a fresh one.
+                if reused:
+                    continue
+                return None, dict(status=-1, msg="Request failed: %s" % to_native(e), url=url)
+
+        if http_response.getheader("connection", "").lower() == "close":
+            self._discard(parts.scheme, parts.netloc)
+
+        info = dict((key.lower(), value) for key, value in http_response.getheaders())
+        info.update(status=http_response.status, msg=http_response.reason, url=url)
+        if http_response.status >= 400:
+            info["body"] = body
+            return None, info
+
+        info["msg"] = "OK (%s bytes)" % len(body)
+        return io.BytesIO(body), info
+
+    def close(self):
+        for key in list(self._connections()):
+            self._discard(*key)
+
+
+CONNECTION_POOL = ConnectionPool()
+
+
+def locked_json_state(path, update=None):
+    """
+    Read the JSON document stored at `path` under an flock. When `update`
+    is given it is called with the document, which is then written back
+    before the lock is released.
+    """
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, 0o700)
+
+    with open("%s.lock" % path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if update is None else fcntl.LOCK_EX)
+        try:
+            try:
+                with open(path) as state_file:
+                    state = json.load(state_file)
+            except (IOError, OSError, ValueError):
+                state = {}
+
+            if update is None:
+                return state
+
+            update(state)
+            tmp_path = "%s.%s.%s.tmp" % (path, os.getpid(), threading.current_thread().ident)
+            # State files can hold IDs and whole API objects, so keep
+            # them readable by their owner only.
+            with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as state_file:
+                json.dump(state, state_file)
+            os.rename(tmp_path, path)
+            return state
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def credentials_scope(base_url, api_key):
+    return hashlib.sha256(
+        to_bytes("%s|%s" % (base_url, hashlib.sha256(to_bytes(api_key or "")).hexdigest()))
+    ).hexdigest()
+
+
+class RateLimiter(object):
+    """
+    Token bucket allowing `rate` requests per minute.
+
+    The bucket lives in a state file guarded by an flock, so every module
+    process on the controller using the same credentials draws from a
+    single budget.
+    """
+
+    default_retry_after = 5
+
+    def __init__(self, path, rate):
+        self.path = path
+        self.rate = rate
+        self.enabled = bool(HAS_FCNTL and path and rate > 0)
+
+    def acquire(self):
+        if not self.enabled:
+            return
+
+        while True:
+            wait = []
+
+            def update(state):
+                now = time.time()
+                tokens = state.get("tokens", float(self.rate))
+                elapsed = max(now - state.get("updated", now), 0)
+                tokens = min(tokens + elapsed * self.rate / 60.0, float(self.rate))
+                blocked_until = state.get("blocked_until", 0)
+
+                if now < blocked_until:
+                    wait.append(blocked_until - now)
+                elif tokens >= 1:
+                    tokens -= 1
+                else:
+                    wait.append((1 - tokens) * 60.0 / self.rate)
+
+                state.update(tokens=tokens, updated=now)
+
+            try:
+                locked_json_state(self.path, update)
+            except (IOError, OSError):
+                return
+
+            if not wait:
+                return
+            time.sleep(wait[0])
+
+    def block(self, retry_after=None):
+        """
+        Empty the shared bucket after a 429 so that no process sends
+        anything before `retry_after` has passed.
+        """
+        delay = self.parse_retry_after(retry_after)
+        if not self.enabled:
+            time.sleep(delay)
+            return
+
+        def update(state):
+            now = time.time()
+            state.update(
+                tokens=0.0,
+                updated=now,
+                blocked_until=max(state.get("blocked_until", 0), now + delay),
+            )
+
+        try:
+            locked_json_state(self.path, update)
+        except (IOError, OSError):
+            time.sleep(delay)
+
+    @classmethod
+    def parse_retry_after(cls, retry_after):
+        if retry_after is None:
+            return cls.default_retry_after
+
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+
+        date = parsedate_tz(retry_after)
+        if date is None:
+            return cls.default_retry_after
+        return max(mktime_tz(date) - time.time(), 0)
+
+
+class ApiStats(object):
+    """
+    Per-module record of every API call sent through RunCloudHelper.send.
+    When the RUNCLOUD_API_TRACE environment variable names a file, every
+    call is also appended to it as a JSON line.
+    """
+
+    trace_env = "RUNCLOUD_API_TRACE"
+
+    def __init__(self, module_name=None):
+        self.module_name = module_name
+        self.calls = []
+        self.lock = threading.Lock()
+        self.trace_path = os.environ.get(self.trace_env)
+
+    @staticmethod
+    def path_template(path):
+        path = path.split("?", 1)[0].strip("/")
+        return re.sub(r"(?<=/)\d+(?=/|$)", "{id}", path)
+
+    def record(self, method, path, status, latency, size, retries):
+        call = dict(
+            method=method,
+            path=self.path_template(path),
+            status=status,
+            latency=round(latency, 6),
+            bytes=size,
+            retries=retries,
+        )
+        with self.lock:
+            self.calls.append(call)
+            if self.trace_path:
+                trace = dict(call, module=self.module_name, time=time.time(), pid=os.getpid())
+                try:
+                    with open(self.trace_path, "a") as trace_file:
+                        trace_file.write(json.dumps(trace) + "\n")
+                except (IOError, OSError):
+                    self.trace_path = None
+
+    def summary(self):
+        with self.lock:
+            calls = list(self.calls)
+
+        latencies = sorted(call["latency"] for call in calls)
+        endpoints = {}
+        for call in calls:
+            key = "%s %s" % (call["method"], call["path"])
+            endpoints[key] = endpoints.get(key, 0) + call["latency"]
+
+        slowest = None
+        if endpoints:
+            slowest_key = max(endpoints, key=endpoints.get)
+            slowest = dict(endpoint=slowest_key, latency=round(endpoints[slowest_key], 6))
+
+        return dict(
+            calls=len(calls),
+            retries=sum(call["retries"] for call in calls),
+            bytes=sum(call["bytes"] for call in calls),
+            total_latency=round(sum(latencies), 6),
+            p95_latency=latencies[int(math.ceil(0.95 * len(latencies))) - 1] if latencies else 0,
+            slowest_endpoint=slowest,
+        )
+
+
+class IdCache(object):
+    """
+    Name to ID cache shared by every module run on the controller.
+
+    Entries are scoped by base_url and a hash of the API key, expire after
+    `ttl` seconds and are kept in a JSON file guarded by an flock, so that
+    parallel forks read and update the same store.
+    """
+
+    max_entries = 4096
+
+    def __init__(self, path, ttl, base_url, api_key):
+        self.path = os.path.expanduser(path) if path else path
+        self.ttl = ttl
+        self.scope = credentials_scope(base_url, api_key)
+        self.enabled = bool(HAS_FCNTL and path and ttl > 0)
+
+    def _key(self, collection, name):
+        return hashlib.sha256(
+            to_bytes(json.dumps([self.scope, collection, name]))
+        ).hexdigest()
+
+    def _update(self, update):
+        def prune(entries):
+            update(entries)
+            self._prune(entries)
+
+        locked_json_state(self.path, prune)
+
+    def _prune(self, entries):
+        now = time.time()
+        for key in [key for key, entry in entries.items() if entry.get("expires", 0) <= now]:
+            del entries[key]
+
+        overflow = len(entries) - self.max_entries
+        if overflow > 0:
+            oldest = sorted(entries, key=lambda key: entries[key].get("expires", 0))
+            for key in oldest[:overflow]:
+                del entries[key]
+
+    def get(self, collection, name):
+        if not self.enabled:
+            return None
+
+        try:
+            entry = locked_json_state(self.path).get(self._key(collection, name))
+        except (IOError, OSError):
+            return None
+
+        if entry is None or entry.get("expires", 0) <= time.time():
+            return None
+
+        return entry.get("id")
+
+    def set(self, collection, name, entity_id):
+        if not self.enabled or entity_id is None:
+            return
+
+        def update(entries):
+            entries[self._key(collection, name)] = dict(
+                scope=self.scope,
+                collection=collection,
+                id=entity_id,
+                expires=time.time() + self.ttl,
+            )
+
+        try:
+            self._update(update)
+        except (IOError, OSError):
+            pass
+
+    def invalidate(self, path):
+        """
+        Drop the entries a write to `path` may have made stale: entries of
+        the collection that was written to, of the entity that was changed
+        and of any collection nested below that entity.
+        """
+        if not self.enabled:
+            return
+
+        path = path.split("?", 1)[0].strip("/")
+
+        def stale(entry):
+            collection = entry.get("collection", "")
+            entity_path = "%s/%s" % (collection, entry.get("id"))
+            if path == collection or path == entity_path:
+                return True
+            if path.startswith(entity_path + "/") or collection.startswith(path + "/"):
+                return True
+            if path.startswith(collection + "/"):
+                return not path[len(collection) + 1:].split("/", 1)[0].isdigit()
+            return False
+
+        def update(entries):
+            for key in [key for key, entry in entries.items() if entry.get("scope") == self.scope and stale(entry)]:
+                del entries[key]
+
+        try:
+            self._update(update)
+        except (IOError, OSError):
+            pass
+
+
+# Set on the threads of concurrent_map's worker pools.
+WORKER_STATE = threading.local()
+
+
+class WorkerFailure(Exception):
+    """
+    fail_json called on a worker thread. Carries the fail_json arguments
+    back to the thread that called concurrent_map, which fails the module
+    once for the whole batch.
+    """
+
+    def __init__(self, kwargs):
+        super(WorkerFailure, self).__init__(kwargs.get("msg"))
+        self.kwargs = kwargs
+
+
 class RunCloudHelper:
     base_url = "https://manage.runcloud.io/api/v2"
+    rate_limit_retries = 5
+    max_page_size = 40
+    idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    retry_statuses = (-1, 500, 502, 503, 504)
+    retry_base_delay = 1.0
+    retry_max_delay = 30.0
+    poll_base_delay = 2.0
+    poll_max_delay = 30.0
+    state_dir = "~/.ansible/tmp"
 
     php_versions = dict(
         [
@@ -63,48 +564,318 @@ class RunCloudHelper:
         })
         self.base_url = module.params.get("base_url", RunCloudHelper.base_url)
         self.timeout = module.params.get("timeout", 120)
+        self.concurrency = module.params.get("concurrency") or 1
+        self.id_cache = IdCache(
+            module.params.get("id_cache_path"),
+            module.params.get("id_cache_ttl") or 0,
+            self.base_url,
+            module.params.get("api_key"),
+        )
         self.headers = {
             "accept": "application/json",
+            "accept-encoding": "gzip, deflate",
             "content-type": "application/json"
         }
+        self.auth_header = "Basic %s" % to_native(base64.b64encode(
+            to_bytes("%s:%s" % (module.params.get("api_key"), module.params.get("api_secret")))
+        ))
+        self.pool = CONNECTION_POOL
+        self.retries = module.params.get("retries") or 0
+        self.retry_call_budget = module.params.get("retry_call_budget") or 0
+        self.retry_budget = module.params.get("retry_budget") or 0
+        self.retry_time_spent = 0.0
+        self.retry_lock = threading.Lock()
+        self.stats = ApiStats(getattr(module, "_name", None))
+        self._report_stats()
+        self.rate_limiter = RateLimiter(
+            os.path.join(
+                os.path.expanduser(RunCloudHelper.state_dir),
+                "runcloud_rate_limit_%s.json" % credentials_scope(self.base_url, module.params.get("api_key"))[:16],
+            ),
+            module.params.get("rate_limit") or 0,
+        )
+
+    def _report_stats(self):
+        """
+        Add the api_stats summary to whatever the module returns.
+        """
+        def with_stats(func):
+            def wrapper(*args, **kwargs):
+                kwargs.setdefault("api_stats", self.stats.summary())
+                return func(*args, **kwargs)
+            return wrapper
+
+        def raise_on_workers(func):
+            def wrapper(msg, **kwargs):
+                if getattr(WORKER_STATE, "active", False):
+                    raise WorkerFailure(dict(kwargs, msg=msg))
+                return func(msg, **kwargs)
+            return wrapper
 
-    def _url_builder(self, path):
+        self.module.exit_json = with_stats(self.module.exit_json)
+        self.module.fail_json = raise_on_workers(with_stats(self.module.fail_json))
+
+    def _url_builder(self, path, params=None):
         if path[0] == "/":
             path = path[1:]
-        return "%s/%s" % (self.base_url, path)
+        url = "%s/%s" % (self.base_url, path)
+        if params:
+            url = "%s%s%s" % (url, "&" if "?" in url else "?", urlencode(params))
+        return url
 
-    def send(self, method, path, data=None):
-        url = self._url_builder(path)
+    def send(self, method, path, data=None, params=None, idempotent=None, fields=None):
+        """
+        Send a request to the API.
+        Connection failures and 5xx answers are retried with exponential
+        backoff for idempotent methods, or for any method when the caller
+        passes idempotent=True.
+        """
+        url = self._url_builder(path, params)
         data = self.module.jsonify(data)
 
         if method == "DELETE":
             if data == "null":
                 data = None
 
-        resp, info = fetch_url(
-            self.module,
-            url,
-            data=data,
-            headers=self.headers,
-            method=method,
-            timeout=self.timeout,
+        if idempotent is None:
+            idempotent = method in self.idempotent_methods
+
+        started = time.time()
+        rate_limited = 0
+        retried = 0
+        slept = 0.0
+        while True:
+            self.rate_limiter.acquire()
+            resp, info = self._request(method, url, data)
+            status = info.get("status")
+
+            if status == 429 and rate_limited < self.rate_limit_retries:
+                rate_limited += 1
+                self.rate_limiter.block(info.get("retry-after"))
+                continue
+
+            if idempotent and status in self.retry_statuses and retried < self.retries:
+                delay = self._retry_delay(retried, slept)
+                if delay is not None:
+                    retried += 1
+                    slept += delay
+                    time.sleep(delay)
+                    continue
+
+            break
+
+        response = Response(resp, info, fields)
+        self.stats.record(
+            method,
+            path,
+            status,
+            time.time() - started,
+            response.size,
+            retried,
+        )
+
+        if status == -1:
+            self.module.fail_json(
+                msg="%s request to %s failed after %s retries: %s" % (method, url, retried, info.get("msg"))
+            )
+
+        if method != "GET" and 0 < response.status_code < 400:
+            self.id_cache.invalidate(path)
+
+        return response
+
+    def _retry_delay(self, attempt, slept):
+        """
+        Return a jittered exponential backoff delay, or None when sleeping
+        would exceed the per-call or per-module retry budget. Both budgets
+        only count the time spent sleeping between attempts, so a request
+        that timed out can still be retried.
+        """
+        delay = random.uniform(
+            0, min(self.retry_max_delay, self.retry_base_delay * (2 ** attempt))
         )
+        if slept + delay > self.retry_call_budget:
+            return None
+
+        with self.retry_lock:
+            if self.retry_time_spent + delay > self.retry_budget:
+                return None
+            self.retry_time_spent += delay
 
-        return Response(resp, info)
+        return delay
+
+    def _request(self, method, url, data):
+        if urlparse(url).scheme in getproxies():
+            # Leave proxied setups to fetch_url, which knows how to handle them
+            resp, info = fetch_url(
+                self.module,
+                url,
+                data=data,
+                headers=self.headers,
+                method=method,
+                timeout=self.timeout,
+            )
+        else:
+            headers = dict(self.headers, authorization=self.auth_header)
+            if method == "GET" and data == "null":
+                data = None
+            resp, info = self.pool.request(
+                method, url, to_bytes(data) if data is not None else None, headers, self.timeout
+            )
+
+        return resp, info
+
+    def concurrent_map(self, func, items):
+        """
+        Apply func to every item using up to `concurrency` threads.
+        Results are returned in the same order as items.
+
+        fail_json called by func on a worker raises WorkerFailure instead
+        of exiting the thread. The first failure cancels the items that
+        have not started yet, waits for the running ones and fails the
+        module once from the calling thread.
+
+        Called from one of the workers, e.g. to page through a listing
+        for every server, func is applied in that worker, one item at a
+        time, so no more than `concurrency` requests are ever in flight.
+        """
+        items = list(items)
+        workers = min(self.concurrency, len(items))
+        if not HAS_FUTURES or workers <= 1 or getattr(WORKER_STATE, "active", False):
+            return [func(item) for item in items]
+
+        def work(item):
+            WORKER_STATE.active = True
+            return func(item)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(work, item) for item in items]
+                done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+                for future in not_done:
+                    future.cancel()
+                for future in futures:
+                    if future in done and future.exception() is not None:
+                        raise future.exception()
+                return [future.result() for future in futures]
+        except WorkerFailure as failure:
+            self.module.fail_json(**failure.kwargs)
+
+    def wait_for(self, path, ready, timeout):
+        """
+        Poll `path` until `ready(entity)` is true. See wait_for_all.
+        Returns the last entity and whether it became ready.
+        """
+        entities, pending = self.wait_for_all([path], ready, timeout)
+        return entities[0], not pending
+
+    def wait_for_all(self, paths, ready, timeout):
+        """
+        Poll every path until `ready(entity)` is true for all of them,
+        sleeping with exponential backoff between rounds and never past
+        `timeout` seconds in total. Each round polls the paths that are
+        not ready yet through the worker pool, on the pooled keep-alive
+        connections. Returns the last entity of every path, in order,
+        and the paths that never became ready. 4xx answers fail the
+        module once the round is over, listing every path that got one,
+        while 5xx answers and bodies that are not a JSON object count as not
+        ready yet, with None as the entity.
+        """
+        def poll(path):
+            response = self.get(path)
+            if response.status_code >= 400 or not isinstance(response.json, dict):
+                return None, response
+            return response.json, response
+
+        started = time.time()
+        delay = self.poll_base_delay
+        entities = dict()
+        pending = list(paths)
+        while True:
+            rejected = []
+            for path, (entity, response) in zip(pending, self.concurrent_map(poll, pending)):
+                entities[path] = entity
+                if 400 <= response.status_code < 500:
+                    rejected.append(
+                        "%s: %s" % (path, (response.json or {}).get("message", response.info.get("msg")))
+                    )
+            if rejected:
+                self.module.fail_json(
+                    msg="Failed to poll %s of %s paths." % (len(rejected), len(pending)),
+                    errors=rejected,
+                )
+            pending = [path for path in pending if entities[path] is None or not ready(entities[path])]
+            if not pending:
+                break
+
+            remaining = timeout - (time.time() - started)
+            if remaining <= 0:
+                break
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.poll_max_delay)
+
+        return [entities[path] for path in paths], pending
+
+    def iter_pages(self, path, data=None, concurrency=1, params=None, fields=None, per_page=None):
+        """
+        Yield the entities of a paginated listing one page at a time.
+        Pages after the first are fetched in batches of `concurrency`
+        pages, so a consumer that stops early only pays for the pages
+        it has seen. `data` and `params` are sent as query parameters on
+        every page, pages hold `per_page` entities (the largest page size
+        the API allows by default) and `fields` limits the keys kept for
+        each entity. An error answer or a page that is not a JSON object
+        fails the module, rather than reading as an empty listing.
+        """
+        params = dict(data or {}, **(params or {}))
+        params.setdefault("perPage", per_page or self.max_page_size)
+
+        def fetch_page(page_params):
+            response = self.get(path, params=page_params, fields=fields)
+            if response.status_code >= 400 or not isinstance(response.json, dict):
+                self.module.fail_json(
+                    msg="Failed to list %s: %s" % (
+                        path,
+                        (response.json if isinstance(response.json, dict) else {}).get("message", response.info.get("msg")),
+                    ),
+                    status=response.status_code,
+                )
+            return response.json
+
+        page = fetch_page(params)
+        for entity in page.get("data", []):
+            yield entity
 
-    def get_all_pages(self, path, data=None):
-        page = self.get(path, data).json
-        page_data = page.get("data", [])
         pagination = page.get("meta", {}).get("pagination", {})
         total_pages = pagination.get("total_pages", 1)
         current_page = pagination.get("current_page", 1)
+        concurrency = max(concurrency, 1)
 
         while current_page < total_pages:
-            current_page = current_page + 1
-            page = self.get("%s?page=%s" % (path, current_page)).json
-            page_data.extend(page.get("data", []))
+            page_numbers = range(
+                current_page + 1, min(current_page + concurrency, total_pages) + 1
+            )
+            pages = self.concurrent_map(
+                lambda page_number: fetch_page(dict(params, page=page_number)),
+                page_numbers,
+            )
+            for page in pages:
+                for entity in page.get("data", []):
+                    yield entity
+            current_page = page_numbers[-1]
+
+    def get_all_pages(self, path, data=None, per_page=None):
+        return list(self.iter_pages(path, data, concurrency=self.concurrency, per_page=per_page))
 
-        return page_data
+    def index_pages(self, path, key, data=None, fields=None):
+        """
+        Fetch every page of a listing once and index its entities by
+        `key`, so many entities can be looked up without rescanning it.
+        """
+        return dict(
+            (entity.get(key), entity)
+            for entity in self.iter_pages(path, data, concurrency=self.concurrency, fields=fields)
+        )
 
     # def get_paginated_data(
     #     self,
@@ -156,51 +927,105 @@ class RunCloudHelper:
 
     #     return ret_data
 
-    def get_id(self, url=None, name_key=None, id_key=None, name_value=None, key_value=None):
-        entities = self.get_all_pages(url)
-        for entity in entities:
-            if name_value is None and entity.get(id_key, 0) == key_value:
-                break
+    def get_entity(self, url, key_value):
+        """
+        Fetch a single entity by ID with one request.
+        Returns None when the API answers with 404.
+        """
+        response = self.get("%s/%s" % (url, key_value))
+        if response.status_code == 404:
+            return None
 
-            if key_value is None and entity.get(name_key, "") == name_value:
-                key_value = entity.get(id_key, None)
-                break
+        entity = response.json
+        if response.status_code >= 400 or entity is None:
+            self.module.fail_json(
+                msg="Failed to fetch %s/%s. status=%s, msg=%s" % (url, key_value, response.status_code, response.info.get("msg"))
+            )
+
+        return entity
+
+    def find_entity(self, url=None, name_key=None, id_key=None, name_value=None, key_value=None):
+        """
+        Find an entity by ID or by name.
+        Entities found by name only carry `id_key` and `name_key`.
+        """
+        if key_value is not None:
+            return self.get_entity(url, key_value)
+
+        cached_id = self.id_cache.get(url, name_value)
+        if cached_id is not None:
+            return {id_key: cached_id, name_key: name_value}
+
+        entity = self.search_entity(url, name_key, name_value, fields=(id_key, name_key))
+        if entity is not None:
+            self.id_cache.set(url, name_value, entity.get(id_key))
+
+        return entity
+
+    def search_entity(self, url, name_key, name_value, fields=None):
+        """
+        Find an entity by the exact value of `name_key` without going
+        through the ID cache. Returns None when there is no match.
+        """
+        # Let the API narrow the listing down, then confirm the exact match
+        # here since the search is a partial match on several fields.
+        filtered = list(self.iter_pages(url, params=dict(search=name_value), fields=fields))
+        matches = [entity for entity in filtered if entity.get(name_key, "") == name_value]
+        if len(matches) == 1:
+            return matches[0]
+
+        if not filtered:
+            return None
+
+        for entity in self.iter_pages(url, fields=fields):
+            if entity.get(name_key, "") == name_value:
+                return entity
+
+        return None
 
-        if key_value is None:
+    def get_id(self, url=None, name_key=None, id_key=None, name_value=None, key_value=None):
+        entity = self.find_entity(
+            url=url,
+            name_key=name_key,
+            id_key=id_key,
+            name_value=name_value,
+            key_value=key_value,
+        )
+
+        if entity is None:
             self.module.fail_json(
                 msg="Failed to find ID by name or ID. url=%s, name_key=%s, id_key=%s, name_value=%s, key_value=%s" % (url, name_key, id_key, name_value, key_value)
             )
 
-        return key_value
+        return entity.get(id_key, key_value)
 
     def get_server_id(self, server_name=None, server_id=None):
-        servers = self.get_all_pages("servers")
-        for server in servers:
-            if server_name is None and server.get("id", 0) == server_id:
-                break
-
-            if server_id is None and server.get("name", "") == server_name:
-                server_id = server.get("id", None)
-                break
+        server = self.find_entity(
+            url="servers",
+            name_key="name",
+            id_key="id",
+            name_value=server_name,
+            key_value=server_id,
+        )
 
-        if server_id is None:
+        if server is None:
             self.module.fail_json(
                 msg="Failed to find server by name or ID."
             )
 
-        return server_id
+        return server.get("id", server_id)
 
-    def get(self, path, data=None):
-        return self.send("GET", path, data)
+    def get(self, path, data=None, params=None, fields=None):
+        return self.send("GET", path, data, params=params, fields=fields)
 
     def put(self, path, data=None):
         return self.send("PUT", path, data)
 
-    def post(self, path, data=None):
-        return self.send("POST", path, data)
+    def post(self, path, data=None, idempotent=None):
+        return self.send("POST", path, data, idempotent=idempotent)
 
-    def patch(self, path, data=None):
-        return self.send("PATCH", path, data)
+    def patch(self, path, data=None, idempotent=None):
+        return self.send("PATCH", path, data, idempotent=idempotent)
 
     def delete(self, path, data=None):
         return self.send("DELETE", path, data)
@@ -230,4 +1055,164 @@ class RunCloudHelper:
                 required=False,
             ),
             timeout=dict(type="int", default=120),
-        )
\ No newline at end of file
+            concurrency=dict(type="int", default=4),
+            retries=dict(type="int", default=3),
+            retry_call_budget=dict(type="int", default=60),
+            retry_budget=dict(type="int", default=300),
+            rate_limit=dict(type="int", default=60),
+            id_cache_ttl=dict(type="int", default=300),
+            id_cache_path=dict(
+                type="path", default="~/.ansible/tmp/runcloud_id_cache.json"
+            ),
+        )
+
+
+class SslCertificates(object):
+    """
+    Walks servers and their web applications through the helper's worker
+    pool to find the SSL certificate of every web application, or of
+    every domain for web applications in advanced SSL mode. Shared by
+    runcloud_ssl_info and runcloud_ssl_renew.
+    """
+
+    date_format = "%Y-%m-%d %H:%M:%S"
+
+    def __init__(self, rest, server_ids=None, server_names=None):
+        self.rest = rest
+        self.module = rest.module
+        self.server_ids = server_ids
+        self.server_names = server_names
+        self.now = datetime.utcnow()
+
+    def servers(self):
+        servers = self.rest.get_all_pages("servers")
+        if self.server_ids is None and self.server_names is None:
+            return servers
+
+        return [
+            server for server in servers
+            if server.get("id") in (self.server_ids or [])
+            or server.get("name") in (self.server_names or [])
+        ]
+
+    def days_left(self, ssl):
+        try:
+            valid_until = datetime.strptime(ssl.get("validUntil", ""), SslCertificates.date_format)
+        except (TypeError, ValueError):
+            return None
+        return (valid_until - self.now).days
+
+    def certificate(self, target, ssl):
+        certificate = dict(
+            (key, target[key])
+            for key in ("server_id", "server_name", "webapp_id", "webapp_name", "domain_id", "domain_name")
+        )
+        certificate["installed"] = ssl is not None
+        if ssl is not None:
+            certificate.update(
+                ssl_id=ssl.get("id"),
+                method=ssl.get("method"),
+                enable_http=ssl.get("enableHttp"),
+                enable_hsts=ssl.get("enableHsts"),
+                ssl_protocol_id=ssl.get("ssl_protocol_id"),
+                staging=ssl.get("staging"),
+                valid_until=ssl.get("validUntil"),
+                days_left=self.days_left(ssl),
+            )
+        return certificate
+
+    def targets(self):
+        """
+        Every place a certificate can be installed: one per web
+        application, or one per domain for web applications in advanced
+        SSL mode. Each stage of the walk is fetched through the helper's
+        worker pool.
+        """
+        servers = self.servers()
+        webapp_pages = self.rest.concurrent_map(
+            lambda server: self.rest.get_all_pages("servers/%s/webapps" % server.get("id")),
+            servers,
+        )
+        webapps = [
+            dict(
+                server_id=server.get("id"),
+                server_name=server.get("name"),
+                webapp_id=webapp.get("id"),
+                webapp_name=webapp.get("name"),
+                domain_id=None,
+                domain_name=None,
+                url="servers/%s/webapps/%s" % (server.get("id"), webapp.get("id")),
+            )
+            for server, page in zip(servers, webapp_pages)
+            for webapp in page
+        ]
+
+        advanced = self.rest.concurrent_map(
+            lambda webapp: self.rest.get("%s/ssl/advanced" % webapp["url"]).json.get("advancedSSL", False),
+            webapps,
+        )
+        advanced_webapps = [webapp for webapp, is_advanced in zip(webapps, advanced) if is_advanced]
+        domain_pages = self.rest.concurrent_map(
+            lambda webapp: self.rest.get_all_pages("%s/domains" % webapp["url"]),
+            advanced_webapps,
+        )
+
+        targets = [
+            dict(webapp, url="%s/ssl" % webapp["url"])
+            for webapp, is_advanced in zip(webapps, advanced) if not is_advanced
+        ]
+        for webapp, page in zip(advanced_webapps, domain_pages):
+            for domain in page:
+                targets.append(
+                    dict(
+                        webapp,
+                        domain_id=domain.get("id"),
+                        domain_name=domain.get("name"),
+                        url="%s/domains/%s/ssl" % (webapp["url"], domain.get("id")),
+                    )
+                )
+        return targets
+
+    @staticmethod
+    def error_message(response):
+        return (response.json or {}).get("message", response.info.get("msg"))
+
+    def fetch_ssl(self, target):
+        """
+        The certificate installed at `target` as (ssl, error): ssl is None
+        when there is none, error is set when the API failed to answer.
+        """
+        response = self.rest.get(target["url"])
+        ssl = response.json
+        if response.status_code == 404 or (ssl or {}).get("message", "") == "SSL not installed!":
+            return None, None
+        if response.status_code >= 400 or ssl is None:
+            return None, "Failed to get SSL of %s: %s" % (target["url"], self.error_message(response))
+        return ssl, None
+
+    def fetch(self, targets):
+        """
+        The certificate of every target, in order. Fails the module once,
+        listing every target whose certificate could not be fetched.
+        """
+        results = self.rest.concurrent_map(self.fetch_ssl, targets)
+        errors = [error for ssl, error in results if error is not None]
+        if errors:
+            self.module.fail_json(
+                msg="Failed to get %s of %s certificates." % (len(errors), len(targets)),
+                errors=errors,
+            )
+        return [ssl for ssl, error in results]
+
+    @staticmethod
+    def sort(certificates):
+        certificates.sort(
+            key=lambda certificate: (
+                certificate.get("days_left") is None,
+                certificate.get("days_left"),
+                certificate["server_name"],
+                certificate["webapp_name"],
+                certificate["domain_name"] or "",
+            )
+        )
+        return certificates
@@ -18,14 +18,110 @@ version_added: "0.0.6"
 
 description: Manage RunCloud databases through the RunCloud API
 
+options:
+    state:
+        description:
+            - The desired state of the database.
+        default: present
+        choices: ["present", "absent"]
+        type: str
+    name:
+        description:
+            - The name of the database to operate on.
+            - Exactly one of O(name) and O(databases) is required.
+        type: str
+    collation:
+        description:
+            - The collation of the database.
+            - Required when the database has to be created.
+        type: str
+    users:
+        description:
+            - Names of the database users granted access to the database.
+            - Users not in the list have their grant revoked.
+            - Grants are left untouched when omitted.
+        type: list
+        elements: str
+    databases:
+        description:
+            - Databases to operate on in a single task.
+            - The server's databases and database users are listed once and the databases to create
+              and the grants to add or revoke are handled concurrently, up to O(concurrency) at a time.
+        type: list
+        elements: dict
+        version_added: "0.0.11"
+        suboptions:
+            name:
+                description: The name of the database.
+                type: str
+                required: true
+            collation:
+                description:
+                    - The collation of the database.
+                    - Defaults to O(collation).
+                type: str
+            users:
+                description:
+                    - Names of the database users granted access to the database.
+                    - Defaults to O(users).
+                type: list
+                elements: str
+extends_documentation_fragment:
+- danni140c.runcloud.runcloud.documentation
+- danni140c.runcloud.runcloud.server_documentation
+
 author:
     - Daniel Rasmussen (@danni140c)
 """
 
 EXAMPLES = r"""
+- name: Ensure database exists with its users
+  danni140c.runcloud.runcloud_database:
+    server_name: My Server
+    name: app_db
+    collation: utf8mb4_unicode_ci
+    users:
+      - db_user
+
+- name: Ensure many databases in one task
+  danni140c.runcloud.runcloud_database:
+    server_name: My Server
+    collation: utf8mb4_unicode_ci
+    databases:
+      - name: app_db
+        users:
+          - db_user
+      - name: reporting_db
+        users:
+          - db_user
+          - db_reporting
 """
 
 RETURN = r"""
+data:
+    description: The database, or the per-database results when O(databases) is used.
+    type: dictionary
+    returned: always
+    sample:
+        databases:
+            - name: app_db
+              changed: true
+              database:
+                  id: 41
+                  name: app_db
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/databases
+            latency: 0.301
 """
 
 from ansible.module_utils.basic import AnsibleModule
@@ -45,72 +141,135 @@ class RCDatabase(object):
         self.name = self.module.params.pop("name")
         self.collation = self.module.params.pop("collation")
         self.users = self.module.params.pop("users")
+        self.databases = self.module.params.pop("databases")
         self.server_id = self.rest.get_server_id(
             server_name=self.server_name, server_id=self.server_id
         )
 
-    def create(self):
-        databases = self.rest.get_all_pages("servers/%s/databases" % (self.server_id))
-        changed = False
-        database = None
+    def reconcile(self, databases):
+        """
+        Create the missing databases and bring the grants of every
+        database to its list of users. The server's databases and
+        database users are listed once, grants are compared as sets of
+        user IDs and all grant and revoke calls go through the helper's
+        worker pool.
+        """
+        fetched_databases = self.rest.index_pages(
+            "servers/%s/databases" % (self.server_id), "name"
+        )
+        results = [
+            dict(name=database["name"], changed=False, database=fetched_databases.get(database["name"]))
+            for database in databases
+        ]
 
-        for fetched_database in databases:
-            if fetched_database.get("name", "") == self.name:
-                database = fetched_database
-                break
+        for database, result in zip(databases, results):
+            if result["database"] is None and not database.get("collation"):
+                self.module.fail_json(
+                    msg="collation is required to create database %s." % database["name"]
+                )
 
-        if database is None:
-            request_data = dict(name=self.name, collation=self.collation)
+        def create(result_database):
+            result, database = result_database
+            request_data = dict(name=database["name"], collation=database["collation"])
             response = self.rest.post(
                 "servers/%s/databases" % (self.server_id), data=request_data
             )
-            changed = True
-            database = response.json
+            result["database"] = self.check(response, "Failed to create database %s" % database["name"])
+            result["changed"] = True
 
-        fetched_db_users = self.rest.get_all_pages("servers/%s/databaseusers" % (self.server_id))
-        db_users = []
+        self.rest.concurrent_map(
+            create,
+            [(result, database) for result, database in zip(results, databases) if result["database"] is None],
+        )
 
-        for fetched_db_user in fetched_db_users:
-            if fetched_db_user.get("username") in self.users:
-                db_users.append(fetched_db_user)
+        managed = [
+            (result, database) for result, database in zip(results, databases)
+            if database.get("users") is not None
+        ]
+        if not managed:
+            return results
 
-        db_grants = self.rest.get_all_pages(
-            "servers/%s/databases/%s/grant" % (self.server_id, database.get("id"))
+        db_user_ids = dict(
+            (username, db_user.get("id"))
+            for username, db_user in self.rest.index_pages(
+                "servers/%s/databaseusers" % (self.server_id), "username"
+            ).items()
         )
 
-        for db_user in db_users:
-            create = True
-            for db_grant in db_grants:
-                if db_user.get("id") == db_grant.get("id"):
-                    create = False
-                    break
-            if create:
-                request_data = dict(id=db_user.get("id"))
-                self.rest.post(
-                    "servers/%s/databases/%s/grant"
-                    % (self.server_id, database.get("id")),
-                    data=request_data,
+        def grant_ids(result_database):
+            result = result_database[0]
+            return set(
+                db_grant.get("id")
+                for db_grant in self.rest.get_all_pages(
+                    "servers/%s/databases/%s/grant" % (self.server_id, result["database"].get("id"))
                 )
-                changed = True
-
-        for db_grant in db_grants:
-            revoke = True
-            for db_user in db_users:
-                if db_grant.get("id") == db_user.get("id"):
-                    revoke = False
-                    break
-            if revoke:
-                request_data = dict(id=db_grant.get("id"))
-                self.rest.delete(
-                    "servers/%s/databases/%s/grant"
-                    % (self.server_id, database.get("id")),
-                    data=request_data,
-                )
-                changed = True
+            )
+
+        granted = self.rest.concurrent_map(grant_ids, managed)
+
+        operations = []
+        for (result, database), current in zip(managed, granted):
+            desired = set(
+                db_user_ids[username] for username in database["users"] if username in db_user_ids
+            )
+            for user_id in desired - current:
+                operations.append((self.rest.post, result, user_id))
+            for user_id in current - desired:
+                operations.append((self.rest.delete, result, user_id))
 
+        def apply(operation):
+            send, result, user_id = operation
+            response = send(
+                "servers/%s/databases/%s/grant" % (self.server_id, result["database"].get("id")),
+                data=dict(id=user_id),
+            )
+            self.check(
+                response,
+                "Failed to %s database user %s on database %s" % (
+                    "grant" if send == self.rest.post else "revoke", user_id, result["name"]
+                ),
+            )
+            result["changed"] = True
+
+        self.rest.concurrent_map(apply, operations)
+
+        return results
+
+    def check(self, response, msg):
+        """
+        Fail the module on an error answer. Called from the helper's
+        worker pool, where the first failure cancels the writes that
+        have not started yet.
+        """
+        if response.status_code >= 400 or response.json is None:
+            self.module.fail_json(
+                msg="%s: %s" % (msg, (response.json or {}).get("message", response.info.get("msg"))),
+                status=response.status_code,
+            )
+        return response.json
+
+    def create(self):
+        if self.databases is None:
+            result = self.reconcile(
+                [dict(name=self.name, collation=self.collation, users=self.users)]
+            )[0]
+            self.module.exit_json(
+                changed=result["changed"],
+                data={"database": result["database"]},
+            )
+
+        databases = [
+            dict(
+                database,
+                collation=database.get("collation") or self.collation,
+                users=self.users if database.get("users") is None else database["users"],
+            )
+            for database in self.databases
+        ]
+        results = self.reconcile(databases)
         self.module.exit_json(
-            changed=changed,
-            data={"database": database},
+            changed=any(result["changed"] for result in results),
+            data={"databases": results},
         )
 
     def delete(self):
@@ -132,13 +291,24 @@ def main():
         server_id=dict(type="str", required=False),
         server_name=dict(type="str", required=False),
         state=dict(choices=["present", "absent"], default="present"),
-        name=dict(type="str", required=True),
-        collation=dict(type="str", required=True),
+        name=dict(type="str", required=False),
+        collation=dict(type="str", required=False),
         users=dict(type="list", elements="str"),
+        databases=dict(
+            type="list",
+            elements="dict",
+            required=False,
+            options=dict(
+                name=dict(type="str", required=True),
+                collation=dict(type="str", required=False),
+                users=dict(type="list", elements="str", required=False),
+            ),
+        ),
     )
     module = AnsibleModule(
         argument_spec=argument_spec,
-        required_one_of=[("server_id", "server_name")],
+        required_one_of=[("server_id", "server_name"), ("name", "databases")],
+        mutually_exclusive=[("name", "databases")],
         supports_check_mode=False,
     )
 
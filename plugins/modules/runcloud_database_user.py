@@ -30,13 +30,39 @@ options:
     username:
         description:
             - The name of the database user to operate on.
+            - Exactly one of O(username) and O(users) is required.
         type: str
-        required: true
     password:
         description:
             - The password of the database user.
             - Required if O(state=present).
         type: str
+    users:
+        description:
+            - Database users to operate on in a single task.
+            - The server's database users are listed once and the users that need to be created
+              or deleted are handled concurrently, up to O(concurrency) at a time.
+            - Each username may only be listed once. When the API rejects a user, the other users are still
+              handled and the task then fails, with the reason in the C(error) of that user's result.
+        type: list
+        elements: dict
+        version_added: "0.0.11"
+        suboptions:
+            username:
+                description: The name of the database user.
+                type: str
+                required: true
+            password:
+                description:
+                    - The password of the database user.
+                    - Required if the user's state is V(present).
+                type: str
+            state:
+                description:
+                    - The desired state of the database user.
+                    - Defaults to O(state).
+                type: str
+                choices: ["present", "absent"]
 extends_documentation_fragment:
 - danni140c.runcloud.runcloud.documentation
 - danni140c.runcloud.runcloud.server_documentation
@@ -58,6 +84,17 @@ EXAMPLES = r"""
     server_id: 113243546
     state: absent
     username: db_user
+
+- name: Ensure many database users in one task
+  danni140c.runcloud.runcloud_database_user:
+    server_name: My Server
+    users:
+      - username: db_user
+        password: secret_db_password
+      - username: db_reporting
+        password: another_secret
+      - username: db_legacy
+        state: absent
 """
 
 RETURN = r"""
@@ -70,6 +107,30 @@ data:
             id: 59
             username: db_user
             created_at: "2024-06-21 07:49:43"
+        database_users:
+            - username: db_user
+              state: present
+              changed: true
+              database_user:
+                  id: 59
+                  username: db_user
+                  created_at: "2024-06-21 07:49:43"
+            - username: db_legacy
+              state: absent
+              changed: false
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/databaseusers
+            latency: 0.301
 msg:
     description: Error message.
     type: str
@@ -93,71 +154,108 @@ class RCDatabaseUser(object):
         self.server_name = self.module.params.pop("server_name", None)
         self.username = self.module.params.pop("username")
         self.password = self.module.params.pop("password")
+        self.users = self.module.params.pop("users")
         self.server_id = self.rest.get_server_id(
             server_name=self.server_name, server_id=self.server_id
         )
 
-    def create(self):
-        db_users = self.rest.get_all_pages(
-            "servers/%s/databaseusers" % (self.server_id)
-        )
-        changed = False
-        db_user = None
-
-        for fetched_db_user in db_users:
-            if fetched_db_user.get("username", "") == self.username:
-                db_user = fetched_db_user
-                break
-
-        if db_user is None:
-            request_data = dict(
-                username=self.username,
-                password=self.password,
-            )
-            response = self.rest.post(
-                "servers/%s/databaseusers" % (self.server_id), data=request_data
+    def reconcile(self, users):
+        """
+        Bring every user in `users` to its state with a single listing of
+        the server's database users, creating and deleting users through
+        the helper's worker pool.
+        """
+        usernames = [user["username"] for user in users]
+        duplicates = sorted(set(username for username in usernames if usernames.count(username) > 1))
+        if duplicates:
+            self.module.fail_json(
+                msg="users lists %s more than once." % ", ".join(duplicates)
             )
-            changed = True
-            db_user = response.json
 
-        self.module.exit_json(
-            changed=changed,
-            data={"database_user": db_user},
-        )
+        for user in users:
+            if user["state"] == "present" and not user.get("password"):
+                self.module.fail_json(
+                    msg="password is required for database user %s when state is present."
+                    % user["username"]
+                )
 
-    def delete(self):
-        db_users = self.rest.get_all_pages(
-            "servers/%s/databaseusers" % (self.server_id)
+        db_users = self.rest.index_pages(
+            "servers/%s/databaseusers" % (self.server_id), "username"
         )
-        changed = False
-        db_user = None
 
-        for fetched_db_user in db_users:
-            if fetched_db_user.get("username", "") == self.username:
-                db_user = fetched_db_user
-                break
+        def apply(user):
+            db_user = db_users.get(user["username"])
+            result = dict(username=user["username"], state=user["state"], changed=False)
+
+            if user["state"] == "present":
+                if db_user is None:
+                    request_data = dict(
+                        username=user["username"],
+                        password=user["password"],
+                    )
+                    response = self.rest.post(
+                        "servers/%s/databaseusers" % (self.server_id), data=request_data
+                    )
+                    if response.status_code >= 400 or response.json is None:
+                        result["error"] = "Failed to create database user %s: %s" % (
+                            user["username"], self.error_message(response)
+                        )
+                        return result
+                    result["changed"] = True
+                    db_user = response.json
+                result["database_user"] = db_user
+            elif db_user is not None:
+                response = self.rest.delete(
+                    "servers/%s/databaseusers/%s" % (self.server_id, db_user.get("id"))
+                )
+                if response.status_code >= 400:
+                    result["error"] = "Failed to delete database user %s: %s" % (
+                        user["username"], self.error_message(response)
+                    )
+                    return result
+                result["changed"] = True
+
+            return result
 
-        if db_user is None:
+        results = self.rest.concurrent_map(apply, users)
+        errors = [result["error"] for result in results if "error" in result]
+        if errors:
+            failure = dict(msg=" ".join(errors), changed=any(result["changed"] for result in results))
+            if self.users is not None:
+                failure.update(errors=errors, data={"database_users": results})
+            self.module.fail_json(**failure)
+        return results
+
+    @staticmethod
+    def error_message(response):
+        return (response.json or {}).get("message", response.info.get("msg"))
+
+    def run(self, state):
+        if self.users is None:
+            result = self.reconcile(
+                [dict(username=self.username, password=self.password, state=state)]
+            )[0]
+            if state == "present":
+                self.module.exit_json(
+                    changed=result["changed"],
+                    data={"database_user": result["database_user"]},
+                )
             self.module.exit_json(
-                changed=changed,
+                changed=result["changed"],
             )
 
-        self.rest.delete(
-            "servers/%s/databaseusers/%s" % (self.server_id, db_user.get("id"))
-        )
-        changed = True
+        users = [dict(user, state=user.get("state") or state) for user in self.users]
+        results = self.reconcile(users)
         self.module.exit_json(
-            changed=changed,
+            changed=any(result["changed"] for result in results),
+            data={"database_users": results},
         )
 
 
 def core(module):
     state = module.params.pop("state")
     server = RCDatabaseUser(module)
-    if state == "present":
-        server.create()
-    elif state == "absent":
-        server.delete()
+    server.run(state)
 
 
 def main():
@@ -166,13 +264,23 @@ def main():
         server_id=dict(type="int", required=False),
         server_name=dict(type="str", required=False),
         state=dict(choices=["present", "absent"], default="present"),
-        username=dict(type="str", required=True),
+        username=dict(type="str", required=False),
         password=dict(type="str", required=False, no_log=False),
+        users=dict(
+            type="list",
+            elements="dict",
+            required=False,
+            options=dict(
+                username=dict(type="str", required=True),
+                password=dict(type="str", required=False, no_log=True),
+                state=dict(choices=["present", "absent"], required=False),
+            ),
+        ),
     )
     module = AnsibleModule(
         argument_spec=argument_spec,
-        required_one_of=[("server_id", "server_name")],
-        required_if=[("state", "present", ("password",))],
+        required_one_of=[("server_id", "server_name"), ("username", "users")],
+        mutually_exclusive=[("username", "users")],
         supports_check_mode=False,
     )
 
@@ -26,6 +26,19 @@ EXAMPLES = r"""
 """
 
 RETURN = r"""
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/webapps/{id}/domains
+            latency: 0.301
 """
 
 from ansible.module_utils.basic import AnsibleModule
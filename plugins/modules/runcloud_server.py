@@ -18,14 +18,196 @@ version_added: "0.0.6"
 
 description: Manage RunCloud servers through the RunCloud API
 
+options:
+    state:
+        description: The desired state of the server.
+        default: present
+        choices: ["present", "absent"]
+        type: str
+    name:
+        description:
+            - The name of the server.
+            - Exactly one of O(name) and O(servers) is required.
+        type: str
+    ip_address:
+        description:
+            - The IP address of the server, used to find it in RunCloud.
+            - Required with O(name).
+        type: str
+    provider:
+        description: The provider hosting the server.
+        type: str
+        default: digitalocean
+    php_version:
+        description:
+            - The PHP CLI version of the server.
+            - Required, either here or for every server in O(servers).
+        type: str
+        choices: ["7.4", "8.0", "8.1", "8.2", "8.3"]
+    install_script:
+        description:
+            - Run the RunCloud installation script on the managed host when the server is not connected.
+            - Defaults to V(true) with O(name). Cannot be enabled with O(servers), whose installation scripts
+              are returned instead, as each of them has to run on its own host.
+        type: bool
+    wait:
+        description:
+            - Wait for servers that are not connected yet to connect to RunCloud.
+            - The servers are polled together with exponential backoff.
+            - With O(servers), servers registered by the task are never waited for, since their installation
+              scripts have not run yet.
+        type: bool
+        default: true
+        version_added: "0.0.11"
+    wait_timeout:
+        description: How long to wait for the server to connect, in seconds.
+        type: int
+        default: 600
+        version_added: "0.0.11"
+    passwordless_login:
+        description: Only allow SSH logins with keys.
+        type: bool
+        default: false
+    use_dns:
+        description: Let the SSH daemon look up the host name of connecting clients.
+        type: bool
+        default: false
+    prevent_root_login:
+        description: Deny SSH logins as root.
+        type: bool
+        default: true
+    software_update:
+        description: Install software updates automatically.
+        type: bool
+        default: false
+    security_update:
+        description: Install security updates automatically.
+        type: bool
+        default: true
+    servers:
+        description:
+            - Servers to operate on in a single task.
+            - The servers are registered and their settings changed concurrently, up to O(concurrency) at a time,
+              and the servers that already existed but are not connected yet are waited for together.
+            - The installation scripts are not run. The installation script of every server that is not connected
+              and not waited for, such as the ones the task registered, is returned instead. Run the scripts on their
+              servers, then repeat the task to wait for the whole batch to connect.
+            - Options left out of a server default to the options of the task.
+        type: list
+        elements: dict
+        version_added: "0.0.11"
+        suboptions:
+            name:
+                description: The name of the server.
+                type: str
+                required: true
+            ip_address:
+                description: The IP address of the server.
+                type: str
+                required: true
+            provider:
+                description: The provider hosting the server.
+                type: str
+            php_version:
+                description: The PHP CLI version of the server.
+                type: str
+                choices: ["7.4", "8.0", "8.1", "8.2", "8.3"]
+            passwordless_login:
+                description: Only allow SSH logins with keys.
+                type: bool
+            use_dns:
+                description: Let the SSH daemon look up the host name of connecting clients.
+                type: bool
+            prevent_root_login:
+                description: Deny SSH logins as root.
+                type: bool
+            software_update:
+                description: Install software updates automatically.
+                type: bool
+            security_update:
+                description: Install security updates automatically.
+                type: bool
+extends_documentation_fragment:
+- danni140c.runcloud.runcloud.documentation
+
 author:
     - Daniel Rasmussen (@danni140c)
 """
 
 EXAMPLES = r"""
+- name: Ensure server is connected to RunCloud
+  danni140c.runcloud.runcloud_server:
+    name: My Server
+    ip_address: 192.0.2.10
+    php_version: "8.2"
+
+# Register a batch of servers, run their installation scripts on all of them
+# at once and wait for the batch to connect. runcloud_servers is a list of
+# server specs, with the ip_address of each server matching its ansible_host.
+- hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Register the servers
+      danni140c.runcloud.runcloud_server:
+        php_version: "8.2"
+        concurrency: 10
+        servers: "{{ runcloud_servers }}"
+      register: registered
+
+- hosts: web
+  tasks:
+    - name: Run the installation script on every server that is not connected yet
+      ansible.builtin.shell: "{{ item.script }}"
+      loop: "{{ hostvars['localhost'].registered.data.servers | selectattr('ip_address', 'equalto', ansible_host) | selectattr('script', 'defined') }}"
+      loop_control:
+        label: "{{ item.name }}"
+      async: 1800
+      poll: 30
+
+- hosts: localhost
+  gather_facts: false
+  tasks:
+    - name: Wait for the batch to connect
+      danni140c.runcloud.runcloud_server:
+        php_version: "8.2"
+        concurrency: 10
+        servers: "{{ runcloud_servers }}"
 """
 
 RETURN = r"""
+data:
+    description:
+        - The server, or the per-server results when O(servers) is used.
+        - With O(servers), servers that are not connected and were not waited for carry their installation script
+          in C(script).
+    type: dictionary
+    returned: always
+    sample:
+        servers:
+            - name: web-1
+              ip_address: 192.0.2.11
+              changed: true
+              script: "export DEBIAN_FRONTEND=noninteractive; echo 'Acquire::ForceIPv4 \"true\";' | ..."
+              server:
+                  id: 113243546
+                  name: web-1
+                  ipAddress: 192.0.2.11
+                  provider: digitalocean
+                  phpCLIVersion: php82rc
+                  connected: false
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/settings/ssh
+            latency: 0.301
 """
 
 from ansible.module_utils.basic import AnsibleModule
@@ -35,105 +217,265 @@ from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import
 
 
 class RCServer(object):
+    spec_keys = (
+        "name",
+        "ip_address",
+        "provider",
+        "php_version",
+        "passwordless_login",
+        "use_dns",
+        "prevent_root_login",
+        "software_update",
+        "security_update",
+    )
+
     def __init__(self, module):
         self.rest = RunCloudHelper(module)
         self.module = module
-        self.wait_timeout = self.module.params.pop("wait_timeout", 120)
-        self.name = self.module.params.pop("name")
-        self.ip_address = self.module.params.pop("ip_address")
-        self.provider = self.module.params.pop("provider")
-        self.php_version = RunCloudHelper.php_versions.get(
-            self.module.params.pop("php_version")
-        )
-        self.paswordless_login = self.module.params.pop("passwordless_login")
-        self.use_dns = self.module.params.pop("use_dns")
-        self.prevent_root_login = self.module.params.pop("prevent_root_login")
-        self.software_update = self.module.params.pop("software_update")
-        self.security_update = self.module.params.pop("security_update")
+        self.wait = self.module.params.pop("wait")
+        self.wait_timeout = self.module.params.pop("wait_timeout")
+        self.install_script = self.module.params.pop("install_script")
+        self.servers = self.module.params.pop("servers")
+        if self.servers is not None and self.install_script:
+            self.module.fail_json(
+                msg="install_script cannot be used with servers: run each returned script on its own server instead."
+            )
+        if self.install_script is None:
+            self.install_script = self.servers is None
+        self.defaults = dict((key, self.module.params.pop(key)) for key in RCServer.spec_keys)
         self.module.params.pop("api_key")
         self.module.params.pop("api_secret")
 
-    def create(self):
-        servers = self.rest.get_all_pages("servers")
-        changed = False
-        server = None
-
-        for fetched_server in servers:
-            if fetched_server.get("ipAddress", "") == self.ip_address:
-                server = fetched_server
-                break
-
-        if server is None:
-            request_data = dict(
-                name=self.name,
-                ipAddress=self.ip_address,
-                provider=self.provider,
-            )
-            response = self.rest.post("servers", data=request_data)
-            changed = True
-            server = response.json
-
-        server_id = server.get("id")
-
-        if server.get("connected") == False:
-            script = self.rest.get("servers/%s/installationscript" % (server_id)).json.get("script")
-            self.module.run_command(args=script, use_unsafe_shell=True)
-            changed = True
-
-        if server.get("phpCLIVersion") != self.php_version:
-            request_data = dict(
-                phpVersion=self.php_version,
-            )
-            response = self.rest.patch(
-                "servers/%s/php/cli" % (server_id), data=request_data
-            )
-            changed = True
-
-        ssh_config = self.rest.get("servers/%s/settings/ssh" % (server_id)).json
-
-        if (
-            ssh_config.get("passwordlessLogin") != self.paswordless_login
-            or ssh_config.get("useDns") != self.use_dns
-            or ssh_config.get("preventRootLogin") != self.prevent_root_login
-        ):
-            request_data = dict(
-                passwordlessLogin=self.paswordless_login,
-                useDns=self.use_dns,
-                preventRootLogin=self.prevent_root_login,
-            )
-            response = self.rest.patch(
-                "servers/%s/settings/ssh" % (server_id), data=request_data
+    def spec(self, server_spec):
+        """
+        Fill a server spec from the task-level options and validate it.
+        """
+        spec = dict(self.defaults)
+        spec.update((key, value) for key, value in server_spec.items() if value is not None)
+        for key in ("name", "ip_address", "php_version"):
+            if spec.get(key) is None:
+                self.module.fail_json(msg="%s is required for every server." % key)
+        spec["php_version"] = RunCloudHelper.php_versions.get(spec["php_version"])
+        return spec
+
+    def settings_groups(self, spec, server, ssh_config):
+        """
+        Every settings group as (path, request data, current values,
+        request key to current key mapping).
+        """
+        return [
+            ("php/cli", dict(phpVersion=spec["php_version"]), server, dict(phpVersion="phpCLIVersion")),
+            (
+                "settings/ssh",
+                dict(
+                    passwordlessLogin=spec["passwordless_login"],
+                    useDns=spec["use_dns"],
+                    preventRootLogin=spec["prevent_root_login"],
+                ),
+                ssh_config,
+                {},
+            ),
+            ("settings/meta", dict(name=spec["name"], provider=spec["provider"]), server, {}),
+            (
+                "settings/autoupdate",
+                dict(
+                    softwareUpdate=spec["software_update"],
+                    securityUpdate=spec["security_update"],
+                ),
+                server,
+                {},
+            ),
+        ]
+
+    def settings_diff(self, spec, server, ssh_config):
+        """
+        The settings groups whose desired values differ from the server's,
+        as (path, request data, server keys to update) tuples.
+        """
+        diff = []
+        for path, request_data, current, keys in self.settings_groups(spec, server, ssh_config):
+            if any(current.get(keys.get(key, key)) != value for key, value in request_data.items()):
+                server_keys = dict(
+                    (keys.get(key, key), value) for key, value in request_data.items()
+                ) if current is server else {}
+                diff.append((path, request_data, server_keys))
+        return diff
+
+    def find_servers(self, specs):
+        """
+        The existing server of every spec, matched by IP address. A single
+        server is searched for, several are matched against one listing.
+        """
+        if len(specs) == 1:
+            return [self.rest.search_entity("servers", "ipAddress", specs[0]["ip_address"])]
+
+        servers = self.rest.index_pages("servers", "ipAddress")
+        return [servers.get(spec["ip_address"]) for spec in specs]
+
+    def register(self, spec):
+        request_data = dict(
+            name=spec["name"],
+            ipAddress=spec["ip_address"],
+            provider=spec["provider"],
+        )
+        response = self.rest.post("servers", data=request_data)
+        if response.status_code >= 400 or not isinstance(response.json, dict):
+            self.module.fail_json(
+                msg="Failed to register server %s: %s" % (spec["name"], self.error_message(response)),
+                status=response.status_code,
             )
-            changed = True
+        return response.json
+
+    def install_script_of(self, result):
+        server_id = result["server"].get("id")
+        return self.rest.get("servers/%s/installationscript" % (server_id)).json.get("script")
+
+    def run_install_script(self, result):
+        script = self.install_script_of(result)
+        rc, stdout, stderr = self.module.run_command(args=script, use_unsafe_shell=True)
+        return dict(name=result["name"], rc=rc, stdout=stdout, stderr=stderr)
+
+    def configure(self, specs, results):
+        """
+        Bring the settings of every server to its spec. The changed
+        settings groups of all the servers are independent of each other,
+        so they are written in a single pass through the worker pool, and
+        rejected writes fail the module once, listing all of them.
+        """
+        ssh_responses = self.rest.concurrent_map(
+            lambda result: self.rest.get("servers/%s/settings/ssh" % (result["server"].get("id"))),
+            results,
+        )
+        errors = [
+            "Failed to get settings/ssh of server %s: %s" % (result["name"], self.error_message(response))
+            for result, response in zip(results, ssh_responses)
+            if response.status_code >= 400 or not isinstance(response.json, dict)
+        ]
+        if errors:
+            self.module.fail_json(msg=" ".join(errors), errors=errors, data=self.result_data(results))
+
+        writes = [
+            (result, path, request_data, server_keys)
+            for spec, result, response in zip(specs, results, ssh_responses)
+            for path, request_data, server_keys in self.settings_diff(spec, result["server"], response.json)
+        ]
+        responses = self.rest.concurrent_map(
+            lambda write: self.rest.patch(
+                "servers/%s/%s" % (write[0]["server"].get("id"), write[1]), data=write[2], idempotent=True
+            ),
+            writes,
+        )
 
-        if server.get("name") != self.name or server.get("provider") != self.provider:
-            request_data = dict(
-                name=self.name,
-                provider=self.provider,
+        written = []
+        for write, response in zip(writes, responses):
+            result, path, request_data, server_keys = write
+            if response.status_code >= 400:
+                errors.append(
+                    "Failed to update %s of server %s: %s" % (path, result["name"], self.error_message(response))
+                )
+                continue
+            # Groups of the server itself answer with the updated server,
+            # the ssh settings answer with themselves.
+            if isinstance(response.json, dict) and response.json.get("id") == result["server"].get("id"):
+                result["server"].update(response.json)
+            result["changed"] = True
+            written.append(write)
+
+        # Groups written at the same time may answer with a server from
+        # before the other writes, so the values written have the last
+        # word.
+        for result, path, request_data, server_keys in written:
+            result["server"].update(server_keys)
+
+        if errors:
+            self.module.fail_json(msg=" ".join(errors), errors=errors, data=self.result_data(results))
+
+    @staticmethod
+    def error_message(response):
+        return (response.json or {}).get("message", response.info.get("msg"))
+
+    def result_data(self, results):
+        if self.servers is None:
+            return {"server": results[0]["server"]}
+        return {"servers": results}
+
+    def reconcile(self, specs):
+        """
+        Register, bootstrap and configure every server: registrations,
+        installation scripts and settings go through the helper's worker
+        pool, and the servers that are not connected yet are waited for
+        together. Installation scripts only run in the single server
+        form; several servers get theirs returned instead, and the ones
+        registered by this task are not waited for.
+        """
+        results = [
+            dict(name=spec["name"], ip_address=spec["ip_address"], changed=False, server=server)
+            for spec, server in zip(specs, self.find_servers(specs))
+        ]
+
+        missing = [(spec, result) for spec, result in zip(specs, results) if result["server"] is None]
+        for (spec, result), server in zip(missing, self.rest.concurrent_map(lambda item: self.register(item[0]), missing)):
+            result["server"] = server
+            result["changed"] = True
+
+        disconnected = [result for result in results if result["server"].get("connected") == False]
+        if self.servers is None:
+            waiting = disconnected if self.wait else []
+        else:
+            # Nothing runs the scripts of servers registered by this task
+            # before it would wait, so they are returned instead, along
+            # with the ones of the servers that are not waited for.
+            registered = set(result["ip_address"] for spec, result in missing)
+            waited = [self.wait and result["ip_address"] not in registered for result in disconnected]
+            waiting = [result for result, is_waited in zip(disconnected, waited) if is_waited]
+            scripted = [result for result, is_waited in zip(disconnected, waited) if not is_waited]
+            for result, script in zip(scripted, self.rest.concurrent_map(self.install_script_of, scripted)):
+                result["script"] = script
+
+        if self.install_script and disconnected:
+            # Only the single server form gets here: the script runs on
+            # the task's host, which is that server.
+            for result, script in zip(disconnected, self.rest.concurrent_map(self.run_install_script, disconnected)):
+                if script["rc"] != 0:
+                    self.module.fail_json(
+                        msg="Failed to run the installation script for %s." % script["name"],
+                        rc=script["rc"],
+                        stdout=script["stdout"],
+                        stderr=script["stderr"],
+                    )
+                result["changed"] = True
+
+        if waiting:
+            servers, pending = self.rest.wait_for_all(
+                ["servers/%s" % (result["server"].get("id")) for result in waiting],
+                lambda fetched_server: fetched_server.get("connected") == True,
+                self.wait_timeout,
             )
-            response = self.rest.patch(
-                "servers/%s/settings/meta" % (server_id), data=request_data
-            )
-            changed = True
-
-        if (
-            server.get("softwareUpdate") != self.software_update
-            or server.get("securityUpdate") != self.security_update
-        ):
-            request_data = dict(
-                softwareUpdate=self.software_update,
-                securityUpdate=self.security_update,
-            )
-            response = self.rest.patch(
-                "servers/%s/settings/autoupdate" % (server_id), data=request_data
-            )
-            changed = True
-
-        server = self.rest.get("servers/%s" % (server_id)).json
+            for result, server in zip(waiting, servers):
+                # A server whose last poll got no usable answer keeps
+                # what was known about it before.
+                if server is not None:
+                    result["server"] = server
+            if pending:
+                self.module.fail_json(
+                    msg="Timed out waiting for server to connect: %s." % ", ".join(
+                        result["name"] for result in waiting
+                        if result["server"].get("connected") != True
+                    ),
+                    data=self.result_data(results),
+                )
+
+        self.configure(specs, results)
+        return results
 
+    def create(self):
+        if self.servers is None:
+            results = self.reconcile([self.spec({})])
+        else:
+            results = self.reconcile([self.spec(server_spec) for server_spec in self.servers])
         self.module.exit_json(
-            changed=changed,
-            data={"server": server},
+            changed=any(result["changed"] for result in results),
+            data=self.result_data(results),
         )
 
     def delete(self):
@@ -152,20 +494,40 @@ def core(module):
 def main():
     argument_spec = RunCloudHelper.runcloud_argument_spec()
     argument_spec.update(
-        name=dict(type="str", required=True),
+        name=dict(type="str", required=False),
         state=dict(choices=["present", "absent"], default="present"),
-        install_script=dict(type="bool", required=False, default=True),
-        ip_address=dict(type="str", required=True),
+        install_script=dict(type="bool", required=False),
+        wait=dict(type="bool", required=False, default=True),
+        wait_timeout=dict(type="int", required=False, default=600),
+        ip_address=dict(type="str", required=False),
         provider=dict(type="str", required=False, default="digitalocean"),
-        php_version=dict(choices=["7.4", "8.0", "8.1", "8.2", "8.3"], required=True),
+        php_version=dict(choices=["7.4", "8.0", "8.1", "8.2", "8.3"], required=False),
         passwordless_login=dict(type="bool", required=False, default=False),
         use_dns=dict(type="bool", required=False, default=False),
         prevent_root_login=dict(type="bool", required=False, default=True),
         software_update=dict(type="bool", required=False, default=False),
         security_update=dict(type="bool", required=False, default=True),
+        servers=dict(
+            type="list",
+            elements="dict",
+            required=False,
+            options=dict(
+                name=dict(type="str", required=True),
+                ip_address=dict(type="str", required=True),
+                provider=dict(type="str", required=False),
+                php_version=dict(choices=["7.4", "8.0", "8.1", "8.2", "8.3"], required=False),
+                passwordless_login=dict(type="bool", required=False),
+                use_dns=dict(type="bool", required=False),
+                prevent_root_login=dict(type="bool", required=False),
+                software_update=dict(type="bool", required=False),
+                security_update=dict(type="bool", required=False),
+            ),
+        ),
     )
     module = AnsibleModule(
         argument_spec=argument_spec,
+        required_one_of=[("name", "servers")],
+        mutually_exclusive=[("name", "servers"), ("ip_address", "servers")],
         supports_check_mode=False,
     )
 
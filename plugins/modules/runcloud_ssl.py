@@ -18,14 +18,121 @@ version_added: "0.0.9"
 
 description: Manage RunCloud SSL through the RunCloud API
 
+options:
+    state:
+        description:
+            - The desired state of the SSL certificate.
+        default: present
+        choices: ["present", "absent", "redeploy"]
+        type: str
+    webapp_id:
+        description:
+            - The ID of the web application.
+            - Either O(webapp_id) or O(webapp_name) is required.
+        type: int
+    webapp_name:
+        description:
+            - The name of the web application.
+            - Either O(webapp_id) or O(webapp_name) is required.
+        type: str
+    advanced:
+        description:
+            - Manage a certificate per domain of the web application instead of one for the whole web application.
+            - Domains are reconciled concurrently, up to O(concurrency) at a time.
+        type: bool
+        default: false
+    auto:
+        description: Let RunCloud install certificates for new domains automatically in advanced mode.
+        type: bool
+        default: false
+    provider:
+        description: The SSL provider.
+        type: str
+        choices: ["letsencrypt"]
+        default: letsencrypt
+    enable_http:
+        description:
+            - Keep serving the web application over plain HTTP.
+            - Changing O(enable_http), O(enable_hsts) or O(protocol) updates the installed certificate in place,
+              while changing O(provider) or O(environment) issues a new certificate.
+        type: bool
+        default: false
+    enable_hsts:
+        description: Send the HSTS header.
+        type: bool
+        default: false
+    protocol:
+        description: The minimum TLS protocol version.
+        type: str
+        choices: ["TLSv1.1", "TLSv1.2", "TLSv1.3"]
+        default: TLSv1.1
+    authorization_method:
+        description: The ACME challenge used to authorize the certificate.
+        type: str
+        choices: ["http-01"]
+        default: http-01
+    environment:
+        description: The Let's Encrypt environment the certificate is issued from.
+        type: str
+        choices: ["live", "staging"]
+        default: live
+extends_documentation_fragment:
+- danni140c.runcloud.runcloud.documentation
+- danni140c.runcloud.runcloud.server_documentation
+
 author:
     - Daniel Rasmussen (@danni140c)
 """
 
 EXAMPLES = r"""
+- name: Install SSL for a web application
+  danni140c.runcloud.runcloud_ssl:
+    server_name: My Server
+    webapp_name: my-webapp
+    enable_hsts: true
+    protocol: TLSv1.2
+
+- name: Install SSL for every domain of a web application, 8 domains at a time
+  danni140c.runcloud.runcloud_ssl:
+    server_name: My Server
+    webapp_name: my-webapp
+    advanced: true
+    concurrency: 8
 """
 
 RETURN = r"""
+data:
+    description:
+        - The SSL certificate of the web application.
+        - In advanced mode, the result for each domain of the web application.
+    type: dictionary
+    returned: success
+    sample:
+        domains:
+            - id: 20
+              name: example.com
+              changed: true
+              ssl:
+                  id: 71
+                  method: letsencrypt
+                  enableHttp: false
+                  enableHsts: true
+                  ssl_protocol_id: 2
+                  staging: false
+                  validUntil: "2030-01-01 00:00:00"
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: POST servers/{id}/webapps/{id}/ssl
+            latency: 0.301
 """
 
 from ansible.module_utils.basic import AnsibleModule
@@ -89,17 +196,79 @@ class RCSsl(object):
         )
         return self.rest.post(url, data=request_data)
 
-    def ssl_differs(self, ssl):
-        return ssl.get("enableHttp") != self.enable_http \
-            or ssl.get("enableHsts") != self.enable_hsts \
-            or ssl.get("ssl_protocol_id") != self.protocol \
+    def settings(self):
+        return dict(
+            enableHttp=self.enable_http,
+            enableHsts=self.enable_hsts,
+            ssl_protocol_id=self.protocol,
+        )
+
+    def needs_reissue(self, ssl):
+        """
+        Whether the certificate itself is wrong: only a new issuance can
+        change the provider or the Let's Encrypt environment.
+        """
+        return ssl.get("method", self.provider) != self.provider \
             or (ssl.get("staging") == False and self.environment == "staging") \
             or (ssl.get("staging") == True and self.environment == "live")
 
+    def settings_differ(self, ssl):
+        return any(ssl.get(key) != value for key, value in self.settings().items())
+
+    def installed_ssl(self, response):
+        """
+        The certificate a GET on an ssl resource answered with, or None
+        when none is installed. The API reports a missing certificate
+        with a "SSL not installed!" message.
+        """
+        ssl = response.json
+        if response.status_code == 404 or (ssl or {}).get("message", "") == "SSL not installed!":
+            return None
+        self.check(response, "Failed to get SSL")
+        return ssl
+
+    def check(self, response, msg):
+        if response.status_code >= 400 or response.json is None:
+            self.module.fail_json(
+                msg="%s: %s" % (msg, (response.json or {}).get("message", response.info.get("msg"))),
+                status=response.status_code,
+            )
+        return response.json
+
+    def ensure_ssl(self, url, ssl):
+        """
+        Bring the certificate at `url` to the desired state. Missing
+        certificates are installed and certificates from the wrong
+        provider or environment are reissued, while drift in the
+        settings alone is updated in place. Returns (changed, ssl).
+        """
+        if ssl is None:
+            return True, self.check(self.install_ssl(url), "Failed to install SSL")
+
+        if self.needs_reissue(ssl):
+            self.check(self.rest.delete("%s/%s" % (url, ssl.get("id"))), "Failed to delete SSL")
+            return True, self.check(self.install_ssl(url), "Failed to install SSL")
+
+        if self.settings_differ(ssl):
+            response = self.rest.patch("%s/%s" % (url, ssl.get("id")), data=self.settings(), idempotent=True)
+            return True, self.check(response, "Failed to update SSL")
+
+        return False, ssl
+
+    def reconcile_domain(self, domain):
+        """
+        Bring the SSL certificate of a single domain to the desired
+        settings. Called from the helper's worker pool, one domain each.
+        """
+        domain_id = domain.get("id")
+        url = "servers/%s/webapps/%s/domains/%s/ssl" % (self.server_id, self.webapp_id, domain_id)
+
+        changed, ssl = self.ensure_ssl(url, self.installed_ssl(self.rest.get(url)))
+
+        return dict(id=domain_id, name=domain.get("name"), changed=changed, ssl=ssl)
 
     def create(self):
         changed = False
-        ssl = None
 
         response = self.rest.get("servers/%s/webapps/%s/ssl/advanced" % (self.server_id, self.webapp_id))
         ssl_advanced = response.json.get("advancedSSL", False)
@@ -115,36 +284,19 @@ class RCSsl(object):
                 self.module.fail_json(
                     msg="Failed to change SSL mode."
                 )
+            changed = True
 
         if self.advanced:
             domains = self.rest.get_all_pages("servers/%s/webapps/%s/domains" % (self.server_id, self.webapp_id))
-            for domain in domains:
-                domain_id = domain.get("id")
-                response = self.rest.get("servers/%s/webapps%s/domains/%s/ssl" % (self.server_id, self.webapp_id, domain_id))
-                if response.status_code >= 400:
-                    response = self.install_ssl("servers/%s/webapps/%s/domains/%s/ssl" % (self.server_id, self.webapp_id, domain_id))
-                    ssl = response.json
-                    changed = True
-                elif (self.ssl_differs(ssl)):
-                    self.rest.delete("servers/%s/webapps/%s/domains/%s/ssl/%s" % (self.server_id, self.webapp_id, domain_id, ssl.get("id")))
-                    response = self.install_ssl("servers/%s/webapps/%s/domains/%s/ssl" % (self.server_id, self.webapp_id, domain_id))
-                    ssl = response.json
-                    changed = True
-
+            results = self.rest.concurrent_map(self.reconcile_domain, domains)
+            self.module.exit_json(
+                changed=changed or any(result["changed"] for result in results),
+                data={"domains": results},
+            )
         else:
-            response = self.rest.get("servers/%s/webapps/%s/ssl" % (self.server_id, self.webapp_id))
-            ssl = response.json
-            ssl_not_installed = ssl.get("message", "") == "SSL not installed!"
-
-            if ssl_not_installed:
-                response = self.install_ssl("servers/%s/webapps/%s/ssl" % (self.server_id, self.webapp_id))
-                ssl = response.json
-                changed = True
-            elif (self.ssl_differs(ssl)):
-                self.rest.delete("servers/%s/webapps/%s/ssl/%s" % (self.server_id, self.webapp_id, ssl.get("id")))
-                response = self.install_ssl("servers/%s/webapps/%s/ssl" % (self.server_id, self.webapp_id))
-                ssl = response.json
-                changed = True
+            url = "servers/%s/webapps/%s/ssl" % (self.server_id, self.webapp_id)
+            ssl_changed, ssl = self.ensure_ssl(url, self.installed_ssl(self.rest.get(url)))
+            changed = changed or ssl_changed
 
         self.module.exit_json(
             changed=changed,
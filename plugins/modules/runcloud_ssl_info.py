@@ -0,0 +1,153 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: runcloud_ssl_info
+
+short_description: List RunCloud SSL certificates by expiry
+
+version_added: "0.0.11"
+
+description:
+    - Walks every server and web application concurrently and returns the SSL certificate of each web application,
+      or of each domain for web applications in advanced SSL mode, sorted by expiry.
+    - Use M(danni140c.runcloud.runcloud_ssl_renew) to reissue the certificates that are about to expire.
+
+options:
+    server_ids:
+        description:
+            - IDs of the servers to walk.
+            - All servers are walked when neither O(server_ids) nor O(server_names) is given.
+        type: list
+        elements: int
+    server_names:
+        description:
+            - Names of the servers to walk.
+            - All servers are walked when neither O(server_ids) nor O(server_names) is given.
+        type: list
+        elements: str
+extends_documentation_fragment:
+- danni140c.runcloud.runcloud.documentation
+
+author:
+    - Daniel Rasmussen (@danni140c)
+"""
+
+EXAMPLES = r"""
+- name: List every certificate, soonest expiry first
+  danni140c.runcloud.runcloud_ssl_info:
+  register: ssl_info
+
+- name: List the certificates of two servers, 8 requests at a time
+  danni140c.runcloud.runcloud_ssl_info:
+    server_names:
+      - web-1
+      - web-2
+    concurrency: 8
+"""
+
+RETURN = r"""
+data:
+    description: The certificates, soonest expiry first. Targets without a certificate come last.
+    type: dictionary
+    returned: always
+    sample:
+        certificates:
+            - server_id: 1
+              server_name: My Server
+              webapp_id: 12
+              webapp_name: my-webapp
+              domain_id: null
+              domain_name: null
+              installed: true
+              ssl_id: 71
+              method: letsencrypt
+              enable_http: false
+              enable_hsts: true
+              ssl_protocol_id: 2
+              staging: false
+              valid_until: "2030-01-01 00:00:00"
+              days_left: 1170
+            - server_id: 1
+              server_name: My Server
+              webapp_id: 13
+              webapp_name: other-webapp
+              domain_id: null
+              domain_name: null
+              installed: false
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/webapps/{id}/ssl
+            latency: 0.301
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    RunCloudHelper,
+    SslCertificates,
+)
+
+
+class RCSslInfo(object):
+    def __init__(self, module):
+        self.rest = RunCloudHelper(module)
+        self.module = module
+        self.module.params.pop("api_key")
+        self.module.params.pop("api_secret")
+        self.certificates = SslCertificates(
+            self.rest,
+            server_ids=self.module.params.pop("server_ids"),
+            server_names=self.module.params.pop("server_names"),
+        )
+
+    def run(self):
+        targets = self.certificates.targets()
+        ssls = self.certificates.fetch(targets)
+        self.module.exit_json(
+            changed=False,
+            data={
+                "certificates": SslCertificates.sort(
+                    [self.certificates.certificate(target, ssl) for target, ssl in zip(targets, ssls)]
+                ),
+            },
+        )
+
+
+def core(module):
+    info = RCSslInfo(module)
+    info.run()
+
+
+def main():
+    argument_spec = RunCloudHelper.runcloud_argument_spec()
+    argument_spec.update(
+        server_ids=dict(type="list", elements="int", required=False),
+        server_names=dict(type="list", elements="str", required=False),
+    )
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+    )
+
+    core(module)
+
+
+if __name__ == "__main__":
+    main()
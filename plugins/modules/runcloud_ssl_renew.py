@@ -0,0 +1,203 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+DOCUMENTATION = r"""
+---
+module: runcloud_ssl_renew
+
+short_description: Renew RunCloud SSL certificates that are about to expire
+
+version_added: "0.0.11"
+
+description:
+    - Walks every server and web application concurrently, like M(danni140c.runcloud.runcloud_ssl_info),
+      and reissues the certificates that expire within O(renew_within_days) days with their current settings.
+    - Certificates are reissued concurrently, up to O(concurrency) at a time. A certificate is reissued by deleting it
+      and installing a new one, so a failed install leaves its web application or domain without a certificate.
+
+options:
+    server_ids:
+        description:
+            - IDs of the servers to walk.
+            - All servers are walked when neither O(server_ids) nor O(server_names) is given.
+        type: list
+        elements: int
+    server_names:
+        description:
+            - Names of the servers to walk.
+            - All servers are walked when neither O(server_ids) nor O(server_names) is given.
+        type: list
+        elements: str
+    renew_within_days:
+        description: The renewal window in days.
+        type: int
+        default: 30
+extends_documentation_fragment:
+- danni140c.runcloud.runcloud.documentation
+
+author:
+    - Daniel Rasmussen (@danni140c)
+"""
+
+EXAMPLES = r"""
+- name: Renew the certificates expiring within two weeks, 8 at a time
+  danni140c.runcloud.runcloud_ssl_renew:
+    renew_within_days: 14
+    concurrency: 8
+"""
+
+RETURN = r"""
+data:
+    description:
+        - The certificates that were reissued and the ones that failed to be reissued.
+        - Certificates in C(failed) carry an C(error); when the install failed after the old certificate was deleted,
+          they are no longer installed. Any failed renewal fails the task.
+    type: dictionary
+    returned: always
+    sample:
+        renewed:
+            - server_id: 1
+              server_name: My Server
+              webapp_id: 12
+              webapp_name: my-webapp
+              domain_id: null
+              domain_name: null
+              installed: true
+              ssl_id: 84
+              method: letsencrypt
+              enable_http: false
+              enable_hsts: true
+              ssl_protocol_id: 2
+              staging: false
+              valid_until: "2030-03-01 00:00:00"
+              days_left: 1229
+        failed:
+            - server_id: 1
+              server_name: My Server
+              webapp_id: 14
+              webapp_name: third-webapp
+              domain_id: null
+              domain_name: null
+              installed: false
+              error: "Failed to install SSL after deleting the old one: Too many certificates already issued."
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/webapps/{id}/ssl
+            latency: 0.301
+"""
+
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    RunCloudHelper,
+    SslCertificates,
+)
+
+
+class RCSslRenew(object):
+    def __init__(self, module):
+        self.rest = RunCloudHelper(module)
+        self.module = module
+        self.module.params.pop("api_key")
+        self.module.params.pop("api_secret")
+        self.renew_within_days = self.module.params.pop("renew_within_days")
+        self.certificates = SslCertificates(
+            self.rest,
+            server_ids=self.module.params.pop("server_ids"),
+            server_names=self.module.params.pop("server_names"),
+        )
+
+    def reissue(self, target_ssl):
+        """
+        Delete and reinstall a certificate with its current settings.
+        Returns (installed certificate, error): when the install fails
+        after the delete, the target is left without a certificate.
+        """
+        target, ssl = target_ssl
+        response = self.rest.delete("%s/%s" % (target["url"], ssl.get("id")))
+        if response.status_code >= 400:
+            return ssl, "Failed to delete SSL: %s" % SslCertificates.error_message(response)
+
+        request_data = dict(
+            provider=ssl.get("method", "letsencrypt"),
+            enableHttp=ssl.get("enableHttp"),
+            enableHsts=ssl.get("enableHsts"),
+            ssl_protocol_id=ssl.get("ssl_protocol_id"),
+            authorizationMethod=ssl.get("authorizationMethod", "http-01"),
+            environment="staging" if ssl.get("staging") else "live",
+        )
+        response = self.rest.post(target["url"], data=request_data)
+        if response.status_code >= 400 or response.json is None:
+            return None, "Failed to install SSL after deleting the old one: %s" % SslCertificates.error_message(response)
+        return response.json, None
+
+    def run(self):
+        targets = self.certificates.targets()
+        expiring = [
+            (target, ssl) for target, ssl in zip(targets, self.certificates.fetch(targets))
+            if ssl is not None
+            and self.certificates.days_left(ssl) is not None
+            and self.certificates.days_left(ssl) <= self.renew_within_days
+        ]
+
+        renewed = []
+        failed = []
+        if self.module.check_mode:
+            renewed = [self.certificates.certificate(target, ssl) for target, ssl in expiring]
+        else:
+            for (target, old_ssl), (ssl, error) in zip(expiring, self.rest.concurrent_map(self.reissue, expiring)):
+                if error is None:
+                    renewed.append(self.certificates.certificate(target, ssl))
+                else:
+                    failed.append(dict(self.certificates.certificate(target, ssl), error=error))
+
+        data = {"renewed": SslCertificates.sort(renewed), "failed": failed}
+        if failed:
+            self.module.fail_json(
+                msg="Failed to renew %s of %s certificates." % (len(failed), len(expiring)),
+                changed=bool(renewed) or any(not certificate["installed"] for certificate in failed),
+                data=data,
+            )
+        self.module.exit_json(
+            changed=bool(renewed),
+            data=data,
+        )
+
+
+def core(module):
+    renew = RCSslRenew(module)
+    renew.run()
+
+
+def main():
+    argument_spec = RunCloudHelper.runcloud_argument_spec()
+    argument_spec.update(
+        server_ids=dict(type="list", elements="int", required=False),
+        server_names=dict(type="list", elements="str", required=False),
+        renew_within_days=dict(type="int", default=30),
+    )
+    module = AnsibleModule(
+        argument_spec=argument_spec,
+        supports_check_mode=True,
+    )
+
+    core(module)
+
+
+if __name__ == "__main__":
+    main()
@@ -18,14 +18,102 @@ version_added: "0.0.6"
 
 description: Manage RunCloud system users through the RunCloud API
 
+options:
+    state:
+        description:
+            - The desired state of the system user.
+            - V(present) will ensure the system user exists.
+            - V(absent) will ensure the system user does not exist.
+        default: present
+        choices: ["present", "absent"]
+        type: str
+    username:
+        description:
+            - The name of the system user to operate on.
+            - Exactly one of O(username) and O(users) is required.
+        type: str
+    password:
+        description:
+            - The password of the system user.
+        type: str
+    users:
+        description:
+            - System users to operate on in a single task.
+            - The server's system users are listed once and the users that need to be created
+              or deleted are handled concurrently, up to O(concurrency) at a time.
+            - Each username may only be listed once. When the API rejects a user, the other users are still
+              handled and the task then fails, with the reason in the C(error) of that user's result.
+        type: list
+        elements: dict
+        version_added: "0.0.11"
+        suboptions:
+            username:
+                description: The name of the system user.
+                type: str
+                required: true
+            password:
+                description: The password of the system user.
+                type: str
+            state:
+                description:
+                    - The desired state of the system user.
+                    - Defaults to O(state).
+                type: str
+                choices: ["present", "absent"]
+extends_documentation_fragment:
+- danni140c.runcloud.runcloud.documentation
+- danni140c.runcloud.runcloud.server_documentation
+
 author:
     - Daniel Rasmussen (@danni140c)
 """
 
 EXAMPLES = r"""
+- name: Ensure system user exists on server using server name
+  danni140c.runcloud.runcloud_system_user:
+    server_name: My Server
+    username: app_user
+    password: secret_password
+
+- name: Ensure many system users in one task
+  danni140c.runcloud.runcloud_system_user:
+    server_name: My Server
+    users:
+      - username: app_user
+        password: secret_password
+      - username: old_user
+        state: absent
 """
 
 RETURN = r"""
+data:
+    description: The system user, or the per-user results when O(users) is used.
+    type: dictionary
+    returned: changed
+    sample:
+        users:
+            - username: app_user
+              state: present
+              changed: true
+              user:
+                  id: 12
+                  username: app_user
+            - username: old_user
+              state: absent
+              changed: false
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/users
+            latency: 0.301
 """
 
 from ansible.module_utils.basic import AnsibleModule
@@ -43,67 +131,103 @@ class RCSystemUser(object):
         self.server_name = self.module.params.pop("server_name", None)
         self.username = self.module.params.pop("username")
         self.password = self.module.params.pop("password")
+        self.users = self.module.params.pop("users")
         self.module.params.pop("api_key")
         self.module.params.pop("api_secret")
         self.server_id = self.rest.get_server_id(
             server_name=self.server_name, server_id=self.server_id
         )
 
-    def create(self):
-        users = self.rest.get_all_pages("servers/%s/users" % (self.server_id))
-        changed = False
-        user = None
-
-        for fetched_user in users:
-            if fetched_user.get("username", "") == self.username:
-                user = fetched_user
-                break
-
-        if user is None:
-            request_data = dict(
-                username=self.username,
-                password=self.password,
-            )
-            response = self.rest.post(
-                "servers/%s/users" % self.server_id, data=request_data
+    def reconcile(self, users):
+        """
+        Bring every user in `users` to its state with a single listing of
+        the server's system users, creating and deleting users through
+        the helper's worker pool.
+        """
+        usernames = [user["username"] for user in users]
+        duplicates = sorted(set(username for username in usernames if usernames.count(username) > 1))
+        if duplicates:
+            self.module.fail_json(
+                msg="users lists %s more than once." % ", ".join(duplicates)
             )
-            changed = True
-            user = response.json
 
-        self.module.exit_json(
-            changed=changed,
-            data={"user": user},
+        system_users = self.rest.index_pages(
+            "servers/%s/users" % (self.server_id), "username"
         )
 
-    def delete(self):
-        users = self.rest.get_all_pages("servers/%s/users" % (self.server_id))
-        changed = False
-        user = None
+        def apply(user):
+            system_user = system_users.get(user["username"])
+            result = dict(username=user["username"], state=user["state"], changed=False)
+
+            if user["state"] == "present":
+                if system_user is None:
+                    request_data = dict(
+                        username=user["username"],
+                        password=user["password"],
+                    )
+                    response = self.rest.post(
+                        "servers/%s/users" % self.server_id, data=request_data
+                    )
+                    if response.status_code >= 400 or response.json is None:
+                        result["error"] = "Failed to create system user %s: %s" % (
+                            user["username"], self.error_message(response)
+                        )
+                        return result
+                    result["changed"] = True
+                    system_user = response.json
+                result["user"] = system_user
+            elif system_user is not None:
+                response = self.rest.delete(
+                    "servers/%s/users/%s" % (self.server_id, system_user.get("id"))
+                )
+                if response.status_code >= 400:
+                    result["error"] = "Failed to delete system user %s: %s" % (
+                        user["username"], self.error_message(response)
+                    )
+                    return result
+                result["changed"] = True
+
+            return result
+
+        results = self.rest.concurrent_map(apply, users)
+        errors = [result["error"] for result in results if "error" in result]
+        if errors:
+            failure = dict(msg=" ".join(errors), changed=any(result["changed"] for result in results))
+            if self.users is not None:
+                failure.update(errors=errors, data={"users": results})
+            self.module.fail_json(**failure)
+        return results
 
-        for fetched_user in users:
-            if fetched_user.get("username", "") == self.username:
-                user = fetched_user
-                break
+    @staticmethod
+    def error_message(response):
+        return (response.json or {}).get("message", response.info.get("msg"))
 
-        if user is None:
+    def run(self, state):
+        if self.users is None:
+            result = self.reconcile(
+                [dict(username=self.username, password=self.password, state=state)]
+            )[0]
+            if state == "present":
+                self.module.exit_json(
+                    changed=result["changed"],
+                    data={"user": result["user"]},
+                )
             self.module.exit_json(
-                changed=changed,
+                changed=result["changed"],
             )
 
-        self.rest.delete("servers/%s/users/%s" % (self.server_id, user.get("id")))
-        changed = True
+        users = [dict(user, state=user.get("state") or state) for user in self.users]
+        results = self.reconcile(users)
         self.module.exit_json(
-            changed=changed,
+            changed=any(result["changed"] for result in results),
+            data={"users": results},
         )
 
 
 def core(module):
     state = module.params.pop("state")
     server = RCSystemUser(module)
-    if state == "present":
-        server.create()
-    elif state == "absent":
-        server.delete()
+    server.run(state)
 
 
 def main():
@@ -112,12 +236,23 @@ def main():
         server_id=dict(type="str", required=False),
         server_name=dict(type="str", required=False),
         state=dict(choices=["present", "absent"], default="present"),
-        username=dict(type="str", required=True),
+        username=dict(type="str", required=False),
         password=dict(type="str", required=False, no_log=True),
+        users=dict(
+            type="list",
+            elements="dict",
+            required=False,
+            options=dict(
+                username=dict(type="str", required=True),
+                password=dict(type="str", required=False, no_log=True),
+                state=dict(choices=["present", "absent"], required=False),
+            ),
+        ),
     )
     module = AnsibleModule(
         argument_spec=argument_spec,
-        required_one_of=[("server_id", "server_name")],
+        required_one_of=[("server_id", "server_name"), ("username", "users")],
+        mutually_exclusive=[("username", "users")],
         supports_check_mode=False,
     )
 
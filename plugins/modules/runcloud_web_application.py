@@ -26,6 +26,19 @@ EXAMPLES = r"""
 """
 
 RETURN = r"""
+api_stats:
+    description: Summary of the RunCloud API calls made by the module.
+    type: dict
+    returned: always
+    sample:
+        calls: 2
+        retries: 0
+        bytes: 1536
+        total_latency: 0.412
+        p95_latency: 0.301
+        slowest_endpoint:
+            endpoint: GET servers/{id}/webapps
+            latency: 0.301
 """
 
 from ansible.module_utils.basic import AnsibleModule
@@ -95,7 +108,7 @@ class RCWebApplication(object):
             name_value=self.server_name,
             key_value=self.server_id
         )
-        self.user_id = self.rest.get_id(
+        user = self.rest.find_entity(
             url="servers/%s/users" % (self.server_id),
             name_key="username",
             id_key="id",
@@ -103,10 +116,16 @@ class RCWebApplication(object):
             key_value=self.user_id
         )
 
+        if user is None:
+            self.module.fail_json(
+                msg="Failed to find system user by name or ID."
+            )
+
+        self.user_id = user.get("id")
+
         if self.open_basedir is None:
-            user = self.rest.get("servers/%s/users/%s" % (self.server_id, self.user_id))
             self.open_basedir = "/home/%s/webapps/%s:/var/lib/php/session:/tmp" % (
-                user.json.get("username"),
+                user.get("username"),
                 self.name,
             )
 
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import importlib
+import json
+import os
+import sys
+import traceback
+
+from ansible.errors import AnsibleError
+from ansible.module_utils import basic
+from ansible.module_utils._text import to_bytes, to_native
+from ansible.module_utils.common.json import AnsibleJSONEncoder
+from ansible.module_utils.six import StringIO
+from ansible.plugins.action import ActionBase
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    RunCloudHelper,
+)
+
+
+class PluginModule(object):
+    """
+    Stand-in for AnsibleModule so that controller-side plugins can talk to
+    the API through RunCloudHelper. Module failures become AnsibleErrors.
+    """
+
+    def __init__(self, name, params):
+        self._name = name
+        self.params = params
+
+    def jsonify(self, data):
+        return json.dumps(data, cls=AnsibleJSONEncoder)
+
+    def fail_json(self, msg, **kwargs):
+        raise AnsibleError(msg)
+
+    def exit_json(self, **kwargs):
+        return kwargs
+
+
+def runcloud_helper(name, **options):
+    """
+    Build a RunCloudHelper for a plugin. Options that are not given, or
+    are None, take their defaults (and environment fallbacks) from
+    RunCloudHelper.runcloud_argument_spec().
+    """
+    params = {}
+    for key, spec in RunCloudHelper.runcloud_argument_spec().items():
+        value = options.get(key)
+        if value is None and "fallback" in spec:
+            for variable in spec["fallback"][1]:
+                if os.environ.get(variable):
+                    value = os.environ[variable]
+                    break
+        if value is None:
+            value = spec.get("default")
+        params[key] = value
+
+    return RunCloudHelper(PluginModule(name, params))
+
+
+def run_module(module_name, module_args, environment=None):
+    """
+    Run a module of this collection in the current process and return
+    its result, as AnsibleModule would have printed it. `environment` is
+    set in os.environ while the module runs, the way the task's
+    environment keyword would be on a target.
+    """
+    module = importlib.import_module(
+        "ansible_collections.danni140c.runcloud.plugins.modules.%s" % module_name
+    )
+
+    basic._ANSIBLE_ARGS = to_bytes(
+        json.dumps(dict(ANSIBLE_MODULE_ARGS=module_args), cls=AnsibleJSONEncoder)
+    )
+    if hasattr(basic, "_ANSIBLE_PROFILE"):
+        basic._ANSIBLE_PROFILE = "legacy"
+
+    environment = dict((key, to_native(value)) for key, value in (environment or {}).items())
+    saved_environment = dict((key, os.environ.get(key)) for key in environment)
+    os.environ.update(environment)
+
+    stdout = sys.stdout
+    sys.stdout = output = StringIO()
+    try:
+        module.main()
+    except SystemExit:
+        pass
+    except Exception as e:
+        return dict(
+            failed=True,
+            msg="Module %s raised an exception: %s" % (module_name, e),
+            exception=traceback.format_exc(),
+        )
+    finally:
+        sys.stdout = stdout
+        basic._ANSIBLE_ARGS = None
+        for key, value in saved_environment.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    try:
+        return json.loads(output.getvalue())
+    except ValueError:
+        return dict(
+            failed=True,
+            msg="Module %s did not return a result." % module_name,
+            module_stdout=output.getvalue(),
+        )
+
+
+class RunCloudActionModule(ActionBase):
+    """
+    Runs a RunCloud module in-process on the controller.
+
+    The modules only talk to the RunCloud API, so there is no need to
+    build an AnsiballZ payload, copy it to the target and start a new
+    interpreter there. Every task run by a worker shares that worker's
+    pooled RunCloud connections. The task's environment keyword is
+    applied to the worker's environment while the module runs, so the
+    RC_API_KEY and RC_API_SECRET fallbacks keep working.
+    """
+
+    def run(self, tmp=None, task_vars=None):
+        if task_vars is None:
+            task_vars = dict()
+
+        result = super(RunCloudActionModule, self).run(tmp, task_vars)
+        del tmp
+
+        module_name = self._task.action.split(".")[-1]
+        module_args = dict(self._task.args)
+        self._update_module_args(module_name, module_args, task_vars)
+        # The module runs on the controller, not in the target's tmpdir
+        module_args.update(
+            _ansible_tmpdir=None,
+            _ansible_remote_tmp="~/.ansible/tmp",
+        )
+
+        environment = dict()
+        self._compute_environment_string(environment)
+        result.update(run_module(module_name, module_args, environment))
+        return result
@@ -0,0 +1,646 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Stand-in for the RunCloud v2 API built on the standard library HTTP server.
+
+It serves the endpoints used by the modules in plugins/modules, wraps
+listings in the same ``data`` / ``meta.pagination`` envelope the real API
+uses, and can be seeded with synthetic fleets of any size.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import itertools
+import json
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+NOW = "2024-06-21 07:49:43"
+
+
+class Fleet(object):
+    """
+    In-memory RunCloud account: servers and everything that hangs off them.
+    """
+
+    def __init__(self):
+        self.ids = itertools.count(1)
+        self.servers = OrderedDict()
+        self.ssh = {}
+        self.webapps = {}
+        self.users = {}
+        self.databases = {}
+        self.database_users = {}
+        self.grants = {}
+        self.domains = {}
+        self.ssl = {}
+        self.advanced_ssl = {}
+        self.domain_ssl = {}
+        self.lock = threading.RLock()
+
+    def add_server(self, name, ip_address=None, provider="digitalocean", connected=True):
+        server_id = next(self.ids)
+        self.servers[server_id] = dict(
+            id=server_id,
+            name=name,
+            provider=provider,
+            ipAddress=ip_address or "10.%s.%s.%s" % ((server_id >> 16) & 255, (server_id >> 8) & 255, server_id & 255),
+            os="Ubuntu",
+            osVersion="22.04",
+            phpCLIVersion="php81rc",
+            softwareUpdate=False,
+            securityUpdate=True,
+            connected=connected,
+            online=connected,
+            agentVersion="2.9.0",
+            created_at=NOW,
+        )
+        self.ssh[server_id] = dict(passwordlessLogin=False, useDns=False, preventRootLogin=True)
+        for collection in (self.webapps, self.users, self.databases, self.database_users):
+            collection[server_id] = OrderedDict()
+        return self.servers[server_id]
+
+    def add_user(self, server_id, username):
+        user_id = next(self.ids)
+        self.users[server_id][user_id] = dict(id=user_id, username=username, deletable=True, created_at=NOW)
+        return self.users[server_id][user_id]
+
+    def add_webapp(self, server_id, name, user_id, php_version="php81rc", domains=0):
+        webapp_id = next(self.ids)
+        self.webapps[server_id][webapp_id] = dict(
+            id=webapp_id,
+            server_user_id=user_id,
+            name=name,
+            rootPath="/home/runcloud/webapps/%s" % name,
+            publicPath=None,
+            phpVersion=php_version,
+            stack="hybrid",
+            stackMode="production",
+            type="custom",
+            defaultApp=False,
+            alias=None,
+            created_at=NOW,
+        )
+        self.domains[webapp_id] = OrderedDict()
+        self.advanced_ssl[webapp_id] = dict(advancedSSL=False, autoSSL=False)
+        for index in range(domains):
+            self.add_domain(webapp_id, "%s-%s.example.com" % (name, index))
+        return self.webapps[server_id][webapp_id]
+
+    def add_domain(self, webapp_id, name, www=False, redirection="none", domain_type="alias"):
+        domain_id = next(self.ids)
+        self.domains[webapp_id][domain_id] = dict(
+            id=domain_id, name=name, www=www, redirection=redirection, type=domain_type, created_at=NOW
+        )
+        return self.domains[webapp_id][domain_id]
+
+    def add_database(self, server_id, name, collation="utf8mb4_unicode_ci"):
+        database_id = next(self.ids)
+        self.databases[server_id][database_id] = dict(id=database_id, name=name, collation=collation, created_at=NOW)
+        self.grants[database_id] = OrderedDict()
+        return self.databases[server_id][database_id]
+
+    def add_database_user(self, server_id, username):
+        user_id = next(self.ids)
+        self.database_users[server_id][user_id] = dict(id=user_id, username=username, created_at=NOW)
+        return self.database_users[server_id][user_id]
+
+    def new_ssl(self, data):
+        ssl_id = next(self.ids)
+        return dict(
+            id=ssl_id,
+            method=data.get("provider", "letsencrypt"),
+            enableHttp=bool(data.get("enableHttp")),
+            enableHsts=bool(data.get("enableHsts")),
+            ssl_protocol_id=data.get("ssl_protocol_id", 1),
+            staging=data.get("environment") == "staging",
+            authorizationMethod=data.get("authorizationMethod", "http-01"),
+            validUntil="2030-01-01 00:00:00",
+            renewalDate="2029-12-01 00:00:00",
+            created_at=NOW,
+        )
+
+    @staticmethod
+    def ssl_settings(data):
+        settings = {}
+        for key in ("enableHttp", "enableHsts"):
+            if key in data:
+                settings[key] = bool(data[key])
+        if "ssl_protocol_id" in data:
+            settings["ssl_protocol_id"] = data["ssl_protocol_id"]
+        return settings
+
+    @classmethod
+    def synthetic(cls, servers=1, webapps=0, users=0, databases=0, database_users=0, domains=0):
+        """
+        Build a fleet of `servers` servers named server-1..N. The last
+        server, the one the benchmarks operate on, gets the requested
+        number of webapps, system users, databases and database users.
+        """
+        fleet = cls()
+        for index in range(1, servers + 1):
+            fleet.add_server("server-%s" % index)
+
+        server_id = list(fleet.servers)[-1]
+        owner = fleet.add_user(server_id, "runcloud")
+        for index in range(1, users + 1):
+            fleet.add_user(server_id, "user-%s" % index)
+        for index in range(1, webapps + 1):
+            fleet.add_webapp(server_id, "webapp-%s" % index, owner["id"], domains=domains)
+        for index in range(1, databases + 1):
+            fleet.add_database(server_id, "database_%s" % index)
+        for index in range(1, database_users + 1):
+            fleet.add_database_user(server_id, "dbuser_%s" % index)
+        return fleet
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super(ApiError, self).__init__(message)
+        self.status = status
+        self.message = message
+
+
+class MockRunCloudAPI(object):
+    """
+    HTTP server exposing a Fleet under /api/v2.
+
+    latency: seconds slept before answering each request.
+    per_page: default listing page size.
+    max_per_page: largest page size honoured for the perPage parameter.
+    compression: whether gzip or deflate is used when the client accepts it.
+    connect_polls: how many GET servers/{id} a new server answers as not
+        connected after its installation script was fetched.
+    missing_ssl_status: status answered, with a "SSL not installed!"
+        message, for a webapp or domain without a certificate.
+    """
+
+    prefix = "/api/v2"
+
+    def __init__(self, fleet=None, latency=0.0, per_page=15, max_per_page=40, compression=True, host="127.0.0.1", port=0,
+                 connect_polls=0, missing_ssl_status=404):
+        self.fleet = fleet or Fleet()
+        self.missing_ssl_status = missing_ssl_status
+        self.connect_polls = connect_polls
+        self.pending_connections = {}
+        self.latency = latency
+        self.per_page = per_page
+        self.max_per_page = max_per_page
+        self.compression = compression
+        self.requests = []
+        self.bytes_sent = 0
+        self.json_bytes = 0
+        self.stats_lock = threading.Lock()
+        self.routes = self._routes()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return "http://%s:%s%s" % (self.httpd.server_address[0], self.httpd.server_address[1], self.prefix)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.requests = []
+            self.bytes_sent = 0
+            self.json_bytes = 0
+
+    def _handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+            wbufsize = -1
+
+            def log_message(self, *args):
+                pass
+
+            def _dispatch(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                status, body, headers = api.handle(self.command, self.path, raw, self.headers)
+                self.send_response(status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+        return Handler
+
+    def handle(self, method, raw_path, raw_body, headers):
+        url = urlparse(raw_path)
+        query = dict((key, values[-1]) for key, values in parse_qs(url.query).items())
+        with self.stats_lock:
+            self.requests.append((method, url.path[len(self.prefix):].strip("/"), query))
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        try:
+            if not self._authorized(headers):
+                raise ApiError(401, "Unauthenticated.")
+            try:
+                data = json.loads(raw_body.decode("utf-8")) if raw_body else {}
+            except ValueError:
+                raise ApiError(400, "Malformed JSON body.")
+            status, payload = self._route(method, url.path, query, data or {})
+        except ApiError as e:
+            status, payload = e.status, dict(message=e.message)
+
+        body = json.dumps(payload).encode("utf-8")
+        json_bytes = len(body)
+        response_headers = OrderedDict([("Content-Type", "application/json")])
+        encoding = self._negotiate_encoding(headers.get("Accept-Encoding", ""))
+        if encoding == "gzip":
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+        elif encoding == "deflate":
+            body = zlib.compress(body, 6)
+        if encoding:
+            response_headers["Content-Encoding"] = encoding
+        with self.stats_lock:
+            self.bytes_sent += len(body)
+            self.json_bytes += json_bytes
+        return status, body, response_headers
+
+    def _negotiate_encoding(self, accept_encoding):
+        if not self.compression:
+            return None
+        accepted = [value.split(";")[0].strip().lower() for value in accept_encoding.split(",")]
+        for encoding in ("gzip", "deflate"):
+            if encoding in accepted:
+                return encoding
+        return None
+
+    @staticmethod
+    def _authorized(headers):
+        authorization = headers.get("Authorization", "")
+        if not authorization.startswith("Basic "):
+            return False
+        credentials = base64.b64decode(authorization[6:]).decode("utf-8")
+        return ":" in credentials and credentials.split(":", 1)[0] not in ("", "None")
+
+    def _route(self, method, path, query, data):
+        if not path.startswith(self.prefix):
+            raise ApiError(404, "Not Found")
+        path = path[len(self.prefix):].rstrip("/")
+        for route_method, pattern, handler in self.routes:
+            match = pattern.match(path)
+            if match and route_method == method:
+                args = [int(value) for value in match.groups()]
+                with self.fleet.lock:
+                    return handler(query, data, *args)
+        raise ApiError(404, "Not Found")
+
+    def _paginate(self, entities, query, search_keys=("name",)):
+        entities = list(entities)
+        search = query.get("search")
+        if search:
+            entities = [
+                entity for entity in entities
+                if any(search.lower() in str(entity.get(key, "")).lower() for key in search_keys)
+            ]
+        per_page = self.per_page
+        if query.get("perPage"):
+            per_page = max(1, min(int(query["perPage"]), self.max_per_page))
+        page = max(1, int(query.get("page", 1)))
+        total_pages = max(1, (len(entities) + per_page - 1) // per_page)
+        rows = entities[(page - 1) * per_page:page * per_page]
+        return 200, dict(
+            data=rows,
+            meta=dict(
+                pagination=dict(
+                    total=len(entities),
+                    count=len(rows),
+                    per_page=per_page,
+                    current_page=page,
+                    total_pages=total_pages,
+                    links={},
+                )
+            ),
+        )
+
+    def _routes(self):
+        server = r"/servers/(\d+)"
+        webapp = server + r"/webapps/(\d+)"
+        routes = [
+            ("GET", r"/servers", self.list_servers),
+            ("POST", r"/servers", self.create_server),
+            ("GET", server, self.get_server),
+            ("GET", server + r"/installationscript", self.installation_script),
+            ("PATCH", server + r"/php/cli", self.update_php_cli),
+            ("GET", server + r"/settings/ssh", self.get_ssh),
+            ("PATCH", server + r"/settings/ssh", self.update_ssh),
+            ("PATCH", server + r"/settings/meta", self.update_meta),
+            ("PATCH", server + r"/settings/autoupdate", self.update_autoupdate),
+            ("GET", server + r"/users", self.list_users),
+            ("POST", server + r"/users", self.create_user),
+            ("GET", server + r"/users/(\d+)", self.get_user),
+            ("DELETE", server + r"/users/(\d+)", self.delete_user),
+            ("GET", server + r"/databases", self.list_databases),
+            ("POST", server + r"/databases", self.create_database),
+            ("GET", server + r"/databases/(\d+)", self.get_database),
+            ("GET", server + r"/databases/(\d+)/grant", self.list_grants),
+            ("POST", server + r"/databases/(\d+)/grant", self.grant),
+            ("DELETE", server + r"/databases/(\d+)/grant", self.revoke),
+            ("GET", server + r"/databaseusers", self.list_database_users),
+            ("POST", server + r"/databaseusers", self.create_database_user),
+            ("GET", server + r"/databaseusers/(\d+)", self.get_database_user),
+            ("DELETE", server + r"/databaseusers/(\d+)", self.delete_database_user),
+            ("GET", server + r"/webapps", self.list_webapps),
+            ("POST", server + r"/webapps/custom", self.create_webapp),
+            ("GET", webapp, self.get_webapp),
+            ("GET", webapp + r"/domains", self.list_domains),
+            ("POST", webapp + r"/domains", self.create_domain),
+            ("GET", webapp + r"/ssl", self.get_ssl),
+            ("POST", webapp + r"/ssl", self.install_ssl),
+            ("PATCH", webapp + r"/ssl/(\d+)", self.update_ssl),
+            ("DELETE", webapp + r"/ssl/(\d+)", self.delete_ssl),
+            ("GET", webapp + r"/ssl/advanced", self.get_advanced_ssl),
+            ("POST", webapp + r"/ssl/advanced", self.set_advanced_ssl),
+            ("GET", webapp + r"/domains/(\d+)/ssl", self.get_domain_ssl),
+            ("POST", webapp + r"/domains/(\d+)/ssl", self.install_domain_ssl),
+            ("PATCH", webapp + r"/domains/(\d+)/ssl/(\d+)", self.update_domain_ssl),
+            ("DELETE", webapp + r"/domains/(\d+)/ssl/(\d+)", self.delete_domain_ssl),
+        ]
+        return [(method, re.compile("^%s$" % pattern), handler) for method, pattern, handler in routes]
+
+    # Lookups
+
+    def _server(self, server_id):
+        if server_id not in self.fleet.servers:
+            raise ApiError(404, "Server not found.")
+        return self.fleet.servers[server_id]
+
+    def _child(self, collection, server_id, entity_id, message):
+        self._server(server_id)
+        entity = collection[server_id].get(entity_id)
+        if entity is None:
+            raise ApiError(404, message)
+        return entity
+
+    def _webapp(self, server_id, webapp_id):
+        return self._child(self.fleet.webapps, server_id, webapp_id, "Web application not found.")
+
+    def _domain(self, server_id, webapp_id, domain_id):
+        self._webapp(server_id, webapp_id)
+        if domain_id not in self.fleet.domains[webapp_id]:
+            raise ApiError(404, "Domain not found.")
+        return self.fleet.domains[webapp_id][domain_id]
+
+    # Servers
+
+    def list_servers(self, query, data):
+        return self._paginate(self.fleet.servers.values(), query, ("name", "ipAddress"))
+
+    def create_server(self, query, data):
+        if not data.get("name") or not data.get("ipAddress"):
+            raise ApiError(422, "The given data was invalid.")
+        server = self.fleet.add_server(
+            data["name"], ip_address=data["ipAddress"], provider=data.get("provider"), connected=False
+        )
+        return 200, server
+
+    def get_server(self, query, data, server_id):
+        server = self._server(server_id)
+        if server_id in self.pending_connections:
+            self.pending_connections[server_id] -= 1
+            if self.pending_connections[server_id] <= 0:
+                del self.pending_connections[server_id]
+                server.update(connected=True, online=True)
+        return 200, server
+
+    def installation_script(self, query, data, server_id):
+        server = self._server(server_id)
+        if self.connect_polls:
+            self.pending_connections[server_id] = self.connect_polls
+        else:
+            server.update(connected=True, online=True)
+        return 200, dict(script="true")
+
+    def update_php_cli(self, query, data, server_id):
+        self._server(server_id)["phpCLIVersion"] = data.get("phpVersion")
+        return 200, self._server(server_id)
+
+    def get_ssh(self, query, data, server_id):
+        self._server(server_id)
+        return 200, self.fleet.ssh[server_id]
+
+    def update_ssh(self, query, data, server_id):
+        self._server(server_id)
+        self.fleet.ssh[server_id].update(data)
+        return 200, self.fleet.ssh[server_id]
+
+    def update_meta(self, query, data, server_id):
+        server = self._server(server_id)
+        server.update(dict((key, data[key]) for key in ("name", "provider") if key in data))
+        return 200, server
+
+    def update_autoupdate(self, query, data, server_id):
+        server = self._server(server_id)
+        server.update(dict((key, data[key]) for key in ("softwareUpdate", "securityUpdate") if key in data))
+        return 200, server
+
+    # System users
+
+    def list_users(self, query, data, server_id):
+        self._server(server_id)
+        return self._paginate(self.fleet.users[server_id].values(), query, ("username",))
+
+    def create_user(self, query, data, server_id):
+        self._server(server_id)
+        if any(user["username"] == data.get("username") for user in self.fleet.users[server_id].values()):
+            raise ApiError(422, "The username has already been taken.")
+        return 200, self.fleet.add_user(server_id, data.get("username"))
+
+    def get_user(self, query, data, server_id, user_id):
+        return 200, self._child(self.fleet.users, server_id, user_id, "System user not found.")
+
+    def delete_user(self, query, data, server_id, user_id):
+        user = self._child(self.fleet.users, server_id, user_id, "System user not found.")
+        del self.fleet.users[server_id][user_id]
+        return 200, user
+
+    # Databases
+
+    def list_databases(self, query, data, server_id):
+        self._server(server_id)
+        return self._paginate(self.fleet.databases[server_id].values(), query)
+
+    def create_database(self, query, data, server_id):
+        self._server(server_id)
+        return 200, self.fleet.add_database(server_id, data.get("name"), data.get("collation"))
+
+    def get_database(self, query, data, server_id, database_id):
+        return 200, self._child(self.fleet.databases, server_id, database_id, "Database not found.")
+
+    def list_grants(self, query, data, server_id, database_id):
+        self._child(self.fleet.databases, server_id, database_id, "Database not found.")
+        return self._paginate(self.fleet.grants[database_id].values(), query, ("username",))
+
+    def grant(self, query, data, server_id, database_id):
+        self._child(self.fleet.databases, server_id, database_id, "Database not found.")
+        user = self._child(self.fleet.database_users, server_id, data.get("id"), "Database user not found.")
+        self.fleet.grants[database_id][user["id"]] = dict(user)
+        return 200, user
+
+    def revoke(self, query, data, server_id, database_id):
+        self._child(self.fleet.databases, server_id, database_id, "Database not found.")
+        user = self.fleet.grants[database_id].pop(data.get("id"), None)
+        if user is None:
+            raise ApiError(404, "Grant not found.")
+        return 200, user
+
+    # Database users
+
+    def list_database_users(self, query, data, server_id):
+        self._server(server_id)
+        return self._paginate(self.fleet.database_users[server_id].values(), query, ("username",))
+
+    def create_database_user(self, query, data, server_id):
+        self._server(server_id)
+        return 200, self.fleet.add_database_user(server_id, data.get("username"))
+
+    def get_database_user(self, query, data, server_id, user_id):
+        return 200, self._child(self.fleet.database_users, server_id, user_id, "Database user not found.")
+
+    def delete_database_user(self, query, data, server_id, user_id):
+        user = self._child(self.fleet.database_users, server_id, user_id, "Database user not found.")
+        del self.fleet.database_users[server_id][user_id]
+        for grants in self.fleet.grants.values():
+            grants.pop(user_id, None)
+        return 200, user
+
+    # Web applications
+
+    def list_webapps(self, query, data, server_id):
+        self._server(server_id)
+        return self._paginate(self.fleet.webapps[server_id].values(), query)
+
+    def create_webapp(self, query, data, server_id):
+        self._server(server_id)
+        webapp = self.fleet.add_webapp(server_id, data.get("name"), data.get("user"), data.get("phpVersion"))
+        self.fleet.add_domain(webapp["id"], data.get("domainName"), domain_type="primary")
+        return 200, webapp
+
+    def get_webapp(self, query, data, server_id, webapp_id):
+        return 200, self._webapp(server_id, webapp_id)
+
+    # Domains
+
+    def list_domains(self, query, data, server_id, webapp_id):
+        self._webapp(server_id, webapp_id)
+        return self._paginate(self.fleet.domains[webapp_id].values(), query)
+
+    def create_domain(self, query, data, server_id, webapp_id):
+        self._webapp(server_id, webapp_id)
+        for domain in self.fleet.domains[webapp_id].values():
+            if domain["name"] == data.get("name"):
+                domain.update(www=data.get("www"), redirection=data.get("redirection"), type=data.get("type"))
+                return 200, domain
+        return 200, self.fleet.add_domain(
+            webapp_id, data.get("name"), data.get("www"), data.get("redirection"), data.get("type")
+        )
+
+    # SSL
+
+    def get_ssl(self, query, data, server_id, webapp_id):
+        self._webapp(server_id, webapp_id)
+        if webapp_id not in self.fleet.ssl:
+            return self.missing_ssl_status, dict(message="SSL not installed!")
+        return 200, self.fleet.ssl[webapp_id]
+
+    def install_ssl(self, query, data, server_id, webapp_id):
+        self._webapp(server_id, webapp_id)
+        if webapp_id in self.fleet.ssl:
+            raise ApiError(422, "SSL already installed.")
+        self.fleet.ssl[webapp_id] = self.fleet.new_ssl(data)
+        return 200, self.fleet.ssl[webapp_id]
+
+    def update_ssl(self, query, data, server_id, webapp_id, ssl_id):
+        self._webapp(server_id, webapp_id)
+        ssl = self.fleet.ssl.get(webapp_id)
+        if ssl is None or ssl["id"] != ssl_id:
+            raise ApiError(404, "SSL not installed!")
+        ssl.update(self.fleet.ssl_settings(data))
+        return 200, ssl
+
+    def delete_ssl(self, query, data, server_id, webapp_id, ssl_id):
+        self._webapp(server_id, webapp_id)
+        ssl = self.fleet.ssl.get(webapp_id)
+        if ssl is None or ssl["id"] != ssl_id:
+            raise ApiError(404, "SSL not installed!")
+        del self.fleet.ssl[webapp_id]
+        return 200, ssl
+
+    def get_advanced_ssl(self, query, data, server_id, webapp_id):
+        self._webapp(server_id, webapp_id)
+        return 200, self.fleet.advanced_ssl[webapp_id]
+
+    def set_advanced_ssl(self, query, data, server_id, webapp_id):
+        self._webapp(server_id, webapp_id)
+        self.fleet.advanced_ssl[webapp_id] = dict(
+            advancedSSL=bool(data.get("advancedSSL")), autoSSL=bool(data.get("autoSSL"))
+        )
+        return 200, self.fleet.advanced_ssl[webapp_id]
+
+    def get_domain_ssl(self, query, data, server_id, webapp_id, domain_id):
+        self._domain(server_id, webapp_id, domain_id)
+        if domain_id not in self.fleet.domain_ssl:
+            return self.missing_ssl_status, dict(message="SSL not installed!")
+        return 200, self.fleet.domain_ssl[domain_id]
+
+    def install_domain_ssl(self, query, data, server_id, webapp_id, domain_id):
+        self._domain(server_id, webapp_id, domain_id)
+        if domain_id in self.fleet.domain_ssl:
+            raise ApiError(422, "SSL already installed.")
+        self.fleet.domain_ssl[domain_id] = self.fleet.new_ssl(data)
+        return 200, self.fleet.domain_ssl[domain_id]
+
+    def update_domain_ssl(self, query, data, server_id, webapp_id, domain_id, ssl_id):
+        self._domain(server_id, webapp_id, domain_id)
+        ssl = self.fleet.domain_ssl.get(domain_id)
+        if ssl is None or ssl["id"] != ssl_id:
+            raise ApiError(404, "SSL not installed!")
+        ssl.update(self.fleet.ssl_settings(data))
+        return 200, ssl
+
+    def delete_domain_ssl(self, query, data, server_id, webapp_id, domain_id, ssl_id):
+        self._domain(server_id, webapp_id, domain_id)
+        ssl = self.fleet.domain_ssl.get(domain_id)
+        if ssl is None or ssl["id"] != ssl_id:
+            raise ApiError(404, "SSL not installed!")
+        del self.fleet.domain_ssl[domain_id]
+        return 200, ssl
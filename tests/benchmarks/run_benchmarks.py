@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Run every module in plugins/modules against the mock RunCloud API and
+report wall time, request count, bytes on the wire and peak memory as
+the fleet grows.
+
+Each scenario runs its module twice against the same fleet: the first
+run creates the resource, the second one finds it already converged.
+
+    python tests/benchmarks/run_benchmarks.py --sizes 10,100,1000 --latency 20
+
+Pass --no-compression to make the API ignore Accept-Encoding and compare
+the transferred bytes with and without gzip.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COLLECTION_ROOT = os.path.dirname(os.path.dirname(HERE))
+MODULES_DIR = os.path.join(COLLECTION_ROOT, "plugins", "modules")
+
+sys.path.insert(0, HERE)
+
+from mock_runcloud_api import Fleet, MockRunCloudAPI  # noqa: E402
+
+
+def scenarios(size):
+    """
+    Module arguments for every module. Modules operate on the last seeded
+    server and its last webapp so that name lookups hit the worst case,
+    runcloud_server registers a new server and runcloud_ssl_info and
+    runcloud_ssl_renew walk the whole fleet.
+    """
+    server_name = "server-%s" % size
+    webapp_name = "webapp-%s" % size
+    return [
+        ("runcloud_server", dict(name="bench-server", ip_address="192.0.2.10", php_version="8.1")),
+        ("runcloud_system_user", dict(server_name=server_name, username="bench-user", password="Secret123!")),
+        ("runcloud_database_user", dict(server_name=server_name, username="bench_dbuser", password="Secret123!")),
+        ("runcloud_database", dict(
+            server_name=server_name, name="bench_db", collation="utf8mb4_unicode_ci", users=["dbuser_1"],
+        )),
+        ("runcloud_web_application", dict(
+            server_name=server_name, name="bench-webapp", domain_name="bench.example.com",
+            user_name="runcloud", php_version="8.1",
+        )),
+        ("runcloud_domain", dict(server_name=server_name, webapp_name=webapp_name, name="bench.example.com")),
+        ("runcloud_ssl", dict(server_name=server_name, webapp_name=webapp_name)),
+        ("runcloud_ssl_info", dict()),
+        ("runcloud_ssl_renew", dict()),
+    ]
+
+
+def module_names():
+    return sorted(
+        name[:-3] for name in os.listdir(MODULES_DIR)
+        if name.startswith("runcloud_") and name.endswith(".py")
+    )
+
+
+class ModuleRunner(object):
+    """
+    Runs modules as standalone processes, the way AnsiballZ would on the
+    target, with the collection importable from a temporary tree.
+    """
+
+    def __init__(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="runcloud-bench-")
+        namespace = os.path.join(self.tmpdir, "ansible_collections", "danni140c")
+        os.makedirs(namespace)
+        os.symlink(COLLECTION_ROOT, os.path.join(namespace, "runcloud"))
+        self.env = dict(os.environ)
+        self.env["PYTHONPATH"] = os.pathsep.join(
+            path for path in (self.tmpdir, os.environ.get("PYTHONPATH")) if path
+        )
+        self.env["HOME"] = self.tmpdir
+
+    def close(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def run(self, module, args):
+        args_path = os.path.join(self.tmpdir, "args.json")
+        with open(args_path, "w") as args_file:
+            json.dump(dict(ANSIBLE_MODULE_ARGS=args), args_file)
+
+        started = time.time()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "ansible_collections.danni140c.runcloud.plugins.modules.%s" % module, args_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=self.env,
+            cwd=self.tmpdir,
+        )
+        stdout, stderr = process.stdout.read(), process.stderr.read()
+        _pid, process.returncode, rusage = os.wait4(process.pid, 0)
+        wall_time = time.time() - started
+
+        try:
+            result = json.loads(stdout.decode("utf-8"))
+        except ValueError:
+            result = dict(failed=True, msg=(stderr or stdout).decode("utf-8", "replace")[-500:])
+
+        return result, wall_time, rusage.ru_maxrss / 1024.0
+
+
+def run(sizes, latency, modules, extra_args, compression=True):
+    runner = ModuleRunner()
+    results = []
+    try:
+        for size in sizes:
+            fleet = Fleet.synthetic(
+                servers=size, webapps=size, users=size, databases=size, database_users=size, domains=2
+            )
+            with MockRunCloudAPI(fleet, latency=latency, compression=compression) as api:
+                for module, args in scenarios(size):
+                    if modules and module not in modules:
+                        continue
+                    args = dict(args, base_url=api.base_url, api_key="bench", api_secret="bench")
+                    args.update(extra_args)
+                    for phase in ("create", "converged"):
+                        api.reset_stats()
+                        result, wall_time, peak_memory = runner.run(module, args)
+                        results.append(dict(
+                            module=module,
+                            phase=phase,
+                            size=size,
+                            wall_time=round(wall_time, 3),
+                            requests=len(api.requests),
+                            bytes=api.bytes_sent,
+                            json_bytes=api.json_bytes,
+                            peak_memory_mb=round(peak_memory, 1),
+                            failed=bool(result.get("failed")),
+                            msg=result.get("msg") if result.get("failed") else None,
+                        ))
+    finally:
+        runner.close()
+    return results
+
+
+def print_table(results):
+    header = "%-26s %-10s %6s %9s %9s %11s %11s %9s  %s" % (
+        "module", "phase", "size", "wall (s)", "requests", "wire bytes", "json bytes", "peak MB", "status"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print("%-26s %-10s %6s %9.3f %9s %11s %11s %9.1f  %s" % (
+            row["module"], row["phase"], row["size"], row["wall_time"], row["requests"],
+            row["bytes"], row["json_bytes"], row["peak_memory_mb"], "FAILED: %s" % row["msg"] if row["failed"] else "ok",
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000", help="comma separated fleet sizes")
+    parser.add_argument("--latency", type=float, default=0, help="latency injected per request, in milliseconds")
+    parser.add_argument("--modules", default="", help="comma separated modules to run (default: all)")
+    parser.add_argument(
+        "--module-arg", action="append", default=[], metavar="KEY=JSON",
+        help="extra argument passed to every module, e.g. concurrency=8",
+    )
+    parser.add_argument(
+        "--no-compression", dest="compression", action="store_false",
+        help="make the API ignore Accept-Encoding and always answer uncompressed",
+    )
+    parser.add_argument("--json", dest="json_path", help="also write the results to this file")
+    options = parser.parse_args()
+
+    modules = [name for name in options.modules.split(",") if name]
+    unknown = set(modules) - set(module_names())
+    if unknown:
+        parser.error("unknown modules: %s" % ", ".join(sorted(unknown)))
+
+    extra_args = dict(id_cache_ttl=0, rate_limit=0)
+    for item in options.module_arg:
+        key, value = item.split("=", 1)
+        try:
+            extra_args[key] = json.loads(value)
+        except ValueError:
+            extra_args[key] = value
+
+    results = run(
+        [int(size) for size in options.sizes.split(",") if size],
+        options.latency / 1000.0,
+        modules,
+        extra_args,
+        options.compression,
+    )
+    print_table(results)
+
+    if options.json_path:
+        with open(options.json_path, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+    return 1 if any(row["failed"] for row in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+import sys
+import tempfile
+
+TESTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLLECTION_ROOT = os.path.dirname(TESTS_DIR)
+
+
+def _ensure_collection_importable():
+    """
+    ansible-test runs the units from inside an ansible_collections tree.
+    When pytest is run straight from a checkout, build such a tree with a
+    symlink so the ansible_collections.danni140c.runcloud imports resolve.
+    """
+    try:
+        import ansible_collections.danni140c.runcloud  # noqa: F401
+        return
+    except ImportError:
+        pass
+
+    root = tempfile.mkdtemp(prefix="runcloud-units-")
+    namespace = os.path.join(root, "ansible_collections", "danni140c")
+    os.makedirs(namespace)
+    os.symlink(COLLECTION_ROOT, os.path.join(namespace, "runcloud"))
+    sys.path.insert(0, root)
+    for name in list(sys.modules):
+        if name == "ansible_collections" or name.startswith("ansible_collections."):
+            del sys.modules[name]
+
+
+_ensure_collection_importable()
+sys.path.insert(0, os.path.join(TESTS_DIR, "benchmarks"))
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import errno
+import os
+import stat
+
+import pytest
+from ansible_collections.danni140c.runcloud.plugins.lookup import runcloud
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    HAS_FCNTL,
+)
+
+
+def kill_failing_with(error_number):
+    def kill(pid, signal):
+        raise OSError(error_number, os.strerror(error_number))
+
+    return kill
+
+
+def test_processes_of_other_users_are_alive(monkeypatch):
+    monkeypatch.setattr(runcloud.os, "kill", kill_failing_with(errno.EPERM))
+    assert runcloud.pid_alive(1)
+
+    monkeypatch.setattr(runcloud.os, "kill", kill_failing_with(errno.ESRCH))
+    assert not runcloud.pid_alive(1)
+
+
+@pytest.mark.skipif(not HAS_FCNTL, reason="needs fcntl")
+def test_memo_is_private_and_keeps_live_runs(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setattr(runcloud, "run_id", lambda: 4242)
+    other_run = runcloud.RunMemo()
+    other_run.set("key", {"id": 1})
+
+    monkeypatch.setattr(runcloud, "run_id", os.getpid)
+    monkeypatch.setattr(runcloud.os, "kill", kill_failing_with(errno.EPERM))
+    memo = runcloud.RunMemo()
+    memo.set("key", {"id": 2})
+
+    assert stat.S_IMODE(os.stat(memo.path).st_mode) == 0o600
+    assert memo.get("key") == {"id": 2}
+    assert other_run.get("key") == {"id": 1}
@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import base64
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.danni140c.runcloud.plugins.module_utils import runcloud
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    HAS_FCNTL,
+    ConnectionPool,
+    IdCache,
+    RateLimiter,
+    RunCloudHelper,
+)
+
+from mock_runcloud_api import Fleet, MockRunCloudAPI
+
+from ..modules.utils import set_module_args
+
+
+HEADERS = {"Authorization": "Basic %s" % base64.b64encode(b"key:secret").decode("ascii")}
+
+
+class FakeTime(object):
+    """
+    Stands in for the time module in module_utils: sleeping only moves
+    the clock forward.
+    """
+
+    def __init__(self):
+        self.now = 1700000000.0
+        self.sleeps = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_time = FakeTime()
+    monkeypatch.setattr(runcloud, "time", fake_time)
+    return fake_time
+
+
+@pytest.fixture
+def helper(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    set_module_args(
+        dict(
+            base_url="http://127.0.0.1:9/api/v2",
+            api_key="key",
+            api_secret="secret",
+            rate_limit=0,
+            id_cache_ttl=0,
+        )
+    )
+    return RunCloudHelper(AnsibleModule(argument_spec=RunCloudHelper.runcloud_argument_spec()))
+
+
+def replay(helper, clock, answers):
+    """
+    Make helper answer every request with the next of `answers`, a list
+    of (status, seconds the attempt takes), and return the list of
+    requests made.
+    """
+    requests = []
+
+    def request(method, url, data):
+        status, duration = answers[len(requests)]
+        requests.append((method, url))
+        clock.now += duration
+        if status == -1:
+            return None, dict(status=-1, msg="Request failed: timed out", url=url)
+        if status >= 400:
+            return None, dict(status=status, msg="Error", url=url, body=b'{"message": "Error"}')
+        return io.BytesIO(b'{"id": 1}'), dict(status=status, msg="OK", url=url)
+
+    helper._request = request
+    return requests
+
+
+def test_timeouts_and_5xx_are_retried_within_the_default_budgets(helper, clock):
+    requests = replay(helper, clock, [(-1, helper.timeout), (503, 0.1), (200, 0.1)])
+    response = helper.get("servers/1")
+    assert response.status_code == 200
+    assert response.json == {"id": 1}
+    assert len(requests) == 3
+    assert len(clock.sleeps) == 2
+    assert helper.stats.summary()["retries"] == 2
+
+
+@pytest.mark.parametrize(
+    "status, body",
+    [(403, b'{"message": "This action is unauthorized."}'), (200, b"<html>Maintenance</html>")],
+    ids=["error", "not-json"],
+)
+def test_listings_fail_instead_of_reading_as_empty(helper, capsys, status, body):
+    def request(method, url, data):
+        if status >= 400:
+            return None, dict(status=status, msg="Forbidden", url=url, body=body)
+        return io.BytesIO(body), dict(status=status, msg="OK", url=url)
+
+    helper._request = request
+    with pytest.raises(SystemExit):
+        helper.search_entity("servers", "name", "web-1")
+
+    result = json.loads(capsys.readouterr().out)
+    assert result["failed"]
+    assert result["msg"].startswith("Failed to list servers: ")
+    assert result["status"] == status
+
+
+def test_non_idempotent_requests_are_not_retried(helper, clock):
+    requests = replay(helper, clock, [(503, 0.1), (200, 0.1)])
+    response = helper.post("servers", data=dict(name="server"))
+    assert response.status_code == 503
+    assert len(requests) == 1
+    assert not clock.sleeps
+
+
+def test_retries_stop_when_the_call_budget_is_spent(helper, clock, monkeypatch):
+    monkeypatch.setattr(runcloud.random, "uniform", lambda low, high: high)
+    helper.retry_call_budget = 3
+    requests = replay(helper, clock, [(503, 0.1)] * 4)
+    assert helper.get("servers/1").status_code == 503
+    # Sleeps of 1s and 2s fit in the budget, a third one of 4s does not.
+    assert clock.sleeps == [1.0, 2.0]
+    assert len(requests) == 3
+
+
+def test_rate_limited_requests_wait_for_retry_after(helper, clock):
+    helper.rate_limiter.block = lambda retry_after: clock.sleep(float(retry_after))
+    requests = []
+
+    def request(method, url, data):
+        requests.append(url)
+        if len(requests) == 1:
+            return None, {"status": 429, "msg": "Too Many Requests", "url": url, "retry-after": "7", "body": b"{}"}
+        return io.BytesIO(b"{}"), dict(status=200, msg="OK", url=url)
+
+    helper._request = request
+    assert helper.post("servers", data=dict(name="server")).status_code == 200
+    assert len(requests) == 2
+    assert clock.sleeps == [7.0]
+
+
+@pytest.mark.skipif(not HAS_FCNTL, reason="needs fcntl")
+def test_rate_limiter_shares_one_bucket(tmp_path, clock):
+    path = str(tmp_path / "rate.json")
+    first = RateLimiter(path, 2)
+    second = RateLimiter(path, 2)
+
+    first.acquire()
+    second.acquire()
+    assert not clock.sleeps
+
+    first.acquire()
+    assert clock.sleeps == [pytest.approx(30.0)]
+
+    # A 429 seen by one process empties the bucket for all of them.
+    second.block("10")
+    first.acquire()
+    assert clock.sleeps[1:] == [pytest.approx(10.0), pytest.approx(20.0)]
+
+
+def test_retry_after_accepts_seconds_and_http_dates(clock):
+    assert RateLimiter.parse_retry_after("12") == 12
+    assert RateLimiter.parse_retry_after(None) == RateLimiter.default_retry_after
+    assert RateLimiter.parse_retry_after("Tue, 14 Nov 2023 22:14:20 GMT") == pytest.approx(60)
+    assert RateLimiter.parse_retry_after("soon") == RateLimiter.default_retry_after
+
+
+@pytest.mark.skipif(not HAS_FCNTL, reason="needs fcntl")
+def test_id_cache_entries_are_scoped_and_expire(tmp_path, clock):
+    path = str(tmp_path / "ids.json")
+    cache = IdCache(path, 60, "https://example.com/api/v2", "key:secret")
+    other_credentials = IdCache(path, 60, "https://example.com/api/v2", "other:secret")
+
+    cache.set("servers", "web-1", 11)
+    assert cache.get("servers", "web-1") == 11
+    assert other_credentials.get("servers", "web-1") is None
+
+    clock.now += 61
+    assert cache.get("servers", "web-1") is None
+
+
+@pytest.mark.skipif(not HAS_FCNTL, reason="needs fcntl")
+@pytest.mark.parametrize(
+    "written, stale",
+    [
+        ("servers", ["servers", "servers/11/webapps", "servers/12/webapps"]),
+        ("servers/11", ["servers", "servers/11/webapps"]),
+        ("servers/11/webapps", ["servers", "servers/11/webapps"]),
+        ("servers/11/webapps/21/domains", ["servers", "servers/11/webapps"]),
+        ("servers/12/webapps", ["servers/12/webapps"]),
+        ("servers/11/settings/meta", ["servers"]),
+    ],
+)
+def test_id_cache_invalidates_entries_a_write_affects(tmp_path, clock, written, stale):
+    cache = IdCache(str(tmp_path / "ids.json"), 60, "https://example.com/api/v2", "key:secret")
+    cache.set("servers", "web-1", 11)
+    cache.set("servers/11/webapps", "app", 21)
+    cache.set("servers/12/webapps", "app", 31)
+
+    cache.invalidate(written)
+
+    cached = dict(
+        (collection, cache.get(collection, name))
+        for collection, name in (("servers", "web-1"), ("servers/11/webapps", "app"), ("servers/12/webapps", "app"))
+    )
+    assert sorted(collection for collection, entity_id in cached.items() if entity_id is None) == sorted(stale)
+
+
+def test_a_failing_worker_fails_the_module_once_and_cancels_the_rest(helper, capsys):
+    helper.concurrency = 2
+    started = []
+    release = threading.Event()
+
+    def work(item):
+        started.append(item)
+        if item == 0:
+            helper.module.fail_json(msg="Item %s failed." % item)
+        release.wait(5)
+        return item
+
+    with pytest.raises(SystemExit):
+        try:
+            helper.concurrent_map(work, range(10))
+        finally:
+            release.set()
+
+    result = json.loads(capsys.readouterr().out)
+    assert result["failed"]
+    assert result["msg"] == "Item 0 failed."
+    assert "api_stats" in result
+    # The worker that failed may pick up one more item before the rest
+    # are cancelled; both workers then block until the batch is over.
+    assert set(started) <= set([0, 1, 2])
+
+
+def test_nested_maps_stay_within_the_concurrency(helper):
+    helper.concurrency = 3
+    lock = threading.Lock()
+    in_flight = [0]
+    peak = [0]
+
+    def request(item):
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return item
+
+    results = helper.concurrent_map(lambda outer: helper.concurrent_map(request, range(outer * 3, outer * 3 + 3)), range(4))
+
+    assert results == [[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10, 11]]
+    assert peak[0] <= 3
+
+
+@pytest.fixture
+def api():
+    with MockRunCloudAPI(Fleet.synthetic(servers=2)) as mock_api:
+        yield mock_api
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_connection_pool_is_not_shared_with_forked_children(api):
+    pool = ConnectionPool()
+    resp, info = pool.request("GET", "%s/servers" % api.base_url, None, HEADERS, 10)
+    assert info["status"] == 200
+    parent_connections = dict(pool._connections())
+    assert parent_connections
+
+    pid = os.fork()
+    if pid == 0:
+        status = 1
+        try:
+            if not pool._connections():
+                resp, info = pool.request("GET", "%s/servers" % api.base_url, None, HEADERS, 10)
+                if info["status"] == 200 and all(
+                    pool._connections()[key] is not parent_connections[key] for key in parent_connections
+                ):
+                    status = 0
+        finally:
+            os._exit(status)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert pool._connections() == parent_connections
+    resp, info = pool.request("GET", "%s/servers" % api.base_url, None, HEADERS, 10)
+    assert info["status"] == 200
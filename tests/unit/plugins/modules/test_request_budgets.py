@@ -0,0 +1,917 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+"""
+Request budgets for every module.
+
+Each case runs a module against the mock RunCloud API, first on the path
+that creates (or deletes) the resource and then on the already converged
+path, and checks the calls it made against a declared maximum and a list
+of allowed endpoints. A change that adds round trips has to update the
+budget here.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import pytest
+from ansible.module_utils.basic import AnsibleModule
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    RunCloudHelper,
+)
+
+from mock_runcloud_api import ApiError, Fleet, MockRunCloudAPI
+
+from .utils import ApiCallRecorder, run_module
+
+FLEET_SIZE = 40
+
+SERVER = "server-%s" % FLEET_SIZE
+WEBAPP = "webapp-%s" % FLEET_SIZE
+
+# module, state, arguments, {phase: (maximum requests, allowed endpoints)}
+# Modules without a state option have None as state, and modules that
+# change nothing on a fleet without certificates only have a converged
+# phase.
+BUDGETS = [
+    (
+        "runcloud_server", "present",
+        dict(name="new-server", ip_address="192.0.2.10", php_version="8.1"),
+        dict(
+            create=(5, [
+                "GET servers",
+                "GET servers/{id}",
+                "GET servers/{id}/installationscript",
+                "GET servers/{id}/settings/ssh",
+                "POST servers",
+            ]),
+            converged=(2, [
+                "GET servers",
+                "GET servers/{id}/settings/ssh",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_server", "present",
+        dict(
+            php_version="8.1",
+            servers=[dict(name="new-server-%s" % i, ip_address="192.0.2.%s" % (20 + i)) for i in range(5)],
+        ),
+        dict(
+            create=(16, [
+                "GET servers",
+                "GET servers/{id}/installationscript",
+                "GET servers/{id}/settings/ssh",
+                "POST servers",
+            ]),
+            converged=(7, [
+                "GET servers",
+                "GET servers/{id}/settings/ssh",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_system_user", "present",
+        dict(server_name=SERVER, username="new-user", password="Secret123!"),
+        dict(
+            create=(4, [
+                "GET servers",
+                "GET servers/{id}/users",
+                "POST servers/{id}/users",
+            ]),
+            converged=(3, [
+                "GET servers",
+                "GET servers/{id}/users",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_system_user", "absent",
+        dict(server_name=SERVER, username="user-1"),
+        dict(
+            create=(4, [
+                "DELETE servers/{id}/users/{id}",
+                "GET servers",
+                "GET servers/{id}/users",
+            ]),
+            converged=(2, [
+                "GET servers",
+                "GET servers/{id}/users",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_database_user", "present",
+        dict(server_name=SERVER, username="new_dbuser", password="Secret123!"),
+        dict(
+            create=(3, [
+                "GET servers",
+                "GET servers/{id}/databaseusers",
+                "POST servers/{id}/databaseusers",
+            ]),
+            converged=(3, [
+                "GET servers",
+                "GET servers/{id}/databaseusers",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_database_user", "absent",
+        dict(server_name=SERVER, username="dbuser_1"),
+        dict(
+            create=(3, [
+                "DELETE servers/{id}/databaseusers/{id}",
+                "GET servers",
+                "GET servers/{id}/databaseusers",
+            ]),
+            converged=(2, [
+                "GET servers",
+                "GET servers/{id}/databaseusers",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_system_user", "present",
+        dict(
+            server_name=SERVER,
+            users=[dict(username="bulk-user-%s" % i, password="Secret123!") for i in range(10)]
+            + [dict(username="user-1", state="absent")],
+        ),
+        dict(
+            create=(14, [
+                "DELETE servers/{id}/users/{id}",
+                "GET servers",
+                "GET servers/{id}/users",
+                "POST servers/{id}/users",
+            ]),
+            converged=(3, [
+                "GET servers",
+                "GET servers/{id}/users",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_database_user", "present",
+        dict(
+            server_name=SERVER,
+            users=[dict(username="bulk_dbuser_%s" % i, password="Secret123!") for i in range(10)]
+            + [dict(username="dbuser_1", state="absent")],
+        ),
+        dict(
+            create=(13, [
+                "DELETE servers/{id}/databaseusers/{id}",
+                "GET servers",
+                "GET servers/{id}/databaseusers",
+                "POST servers/{id}/databaseusers",
+            ]),
+            converged=(3, [
+                "GET servers",
+                "GET servers/{id}/databaseusers",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_database", "present",
+        dict(server_name=SERVER, name="new_db", collation="utf8mb4_unicode_ci", users=["dbuser_1", "dbuser_2"]),
+        dict(
+            create=(7, [
+                "GET servers",
+                "GET servers/{id}/databases",
+                "GET servers/{id}/databases/{id}/grant",
+                "GET servers/{id}/databaseusers",
+                "POST servers/{id}/databases",
+                "POST servers/{id}/databases/{id}/grant",
+            ]),
+            converged=(5, [
+                "GET servers",
+                "GET servers/{id}/databases",
+                "GET servers/{id}/databases/{id}/grant",
+                "GET servers/{id}/databaseusers",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_database", "present",
+        dict(
+            server_name=SERVER,
+            collation="utf8mb4_unicode_ci",
+            users=["dbuser_1"],
+            databases=[
+                dict(name="new_db"),
+                dict(name="database_1", users=["dbuser_1", "dbuser_2"]),
+                dict(name="database_2"),
+            ],
+        ),
+        dict(
+            create=(11, [
+                "GET servers",
+                "GET servers/{id}/databases",
+                "GET servers/{id}/databases/{id}/grant",
+                "GET servers/{id}/databaseusers",
+                "POST servers/{id}/databases",
+                "POST servers/{id}/databases/{id}/grant",
+            ]),
+            converged=(7, [
+                "GET servers",
+                "GET servers/{id}/databases",
+                "GET servers/{id}/databases/{id}/grant",
+                "GET servers/{id}/databaseusers",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_web_application", "present",
+        dict(server_name=SERVER, name="new-webapp", domain_name="new.example.com", user_name="runcloud", php_version="8.1"),
+        dict(
+            create=(4, [
+                "GET servers",
+                "GET servers/{id}/users",
+                "GET servers/{id}/webapps",
+                "POST servers/{id}/webapps/custom",
+            ]),
+            converged=(4, [
+                "GET servers",
+                "GET servers/{id}/users",
+                "GET servers/{id}/webapps",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_domain", "present",
+        dict(server_name=SERVER, webapp_name=WEBAPP, name="new.example.com"),
+        dict(
+            create=(4, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/domains",
+                "POST servers/{id}/webapps/{id}/domains",
+            ]),
+            converged=(3, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/domains",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_ssl", "present",
+        dict(server_name=SERVER, webapp_name=WEBAPP),
+        dict(
+            create=(5, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/ssl",
+                "GET servers/{id}/webapps/{id}/ssl/advanced",
+                "POST servers/{id}/webapps/{id}/ssl",
+            ]),
+            converged=(4, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/ssl",
+                "GET servers/{id}/webapps/{id}/ssl/advanced",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_ssl", "present",
+        dict(server_name=SERVER, webapp_name=WEBAPP, advanced=True),
+        dict(
+            create=(9, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/domains",
+                "GET servers/{id}/webapps/{id}/domains/{id}/ssl",
+                "GET servers/{id}/webapps/{id}/ssl/advanced",
+                "POST servers/{id}/webapps/{id}/domains/{id}/ssl",
+                "POST servers/{id}/webapps/{id}/ssl/advanced",
+            ]),
+            converged=(6, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/domains",
+                "GET servers/{id}/webapps/{id}/domains/{id}/ssl",
+                "GET servers/{id}/webapps/{id}/ssl/advanced",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_ssl_info", None,
+        dict(),
+        dict(
+            converged=(121, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/ssl",
+                "GET servers/{id}/webapps/{id}/ssl/advanced",
+            ]),
+        ),
+    ),
+    (
+        "runcloud_ssl_renew", None,
+        dict(),
+        dict(
+            converged=(121, [
+                "GET servers",
+                "GET servers/{id}/webapps",
+                "GET servers/{id}/webapps/{id}/ssl",
+                "GET servers/{id}/webapps/{id}/ssl/advanced",
+            ]),
+        ),
+    ),
+]
+
+
+def case_id(case):
+    module, state, args = case[:3]
+    if state is None:
+        return module
+    if "databases" in args or "servers" in args or ("users" in args and "name" not in args):
+        return "%s-%s-bulk" % (module, state)
+    if args.get("advanced"):
+        return "%s-%s-advanced" % (module, state)
+    return "%s-%s" % (module, state)
+
+
+@pytest.fixture
+def api():
+    fleet = Fleet.synthetic(
+        servers=FLEET_SIZE,
+        webapps=FLEET_SIZE,
+        users=FLEET_SIZE,
+        databases=FLEET_SIZE,
+        database_users=FLEET_SIZE,
+        domains=2,
+    )
+    with MockRunCloudAPI(fleet) as mock_api:
+        yield mock_api
+
+
+@pytest.fixture
+def recorder(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return ApiCallRecorder(monkeypatch)
+
+
+@pytest.mark.parametrize(
+    "module, state, args, budgets",
+    BUDGETS,
+    ids=[case_id(case) for case in BUDGETS],
+)
+def test_request_budget(api, recorder, capsys, module, state, args, budgets):
+    args = dict(
+        args,
+        base_url=api.base_url,
+        api_key="key",
+        api_secret="secret",
+        id_cache_ttl=0,
+        rate_limit=0,
+    )
+    if state is not None:
+        args["state"] = state
+
+    for phase in ("create", "converged"):
+        if phase not in budgets:
+            continue
+        recorder.reset()
+        result = run_module(module, args, capsys)
+        assert not result.get("failed"), result.get("msg")
+        assert result["changed"] == (phase == "create")
+
+        maximum, allowed = budgets[phase]
+        unexpected = sorted(set(call for call in recorder.calls if "%s %s" % call not in allowed))
+        assert not unexpected, "%s %s made calls to unexpected endpoints: %s" % (module, phase, unexpected)
+        assert len(recorder.calls) <= maximum, "%s %s made %s requests, budget is %s: %s" % (
+            module, phase, len(recorder.calls), maximum, recorder.calls,
+        )
+
+
+@pytest.mark.parametrize(
+    "module, handler, existing, result_key",
+    [
+        ("runcloud_system_user", "create_user", "user-1", "users"),
+        ("runcloud_database_user", "create_database_user", "dbuser_1", "database_users"),
+    ],
+    ids=["system-user", "database-user"],
+)
+def test_bulk_users_report_rejected_writes_and_duplicates(api, capsys, monkeypatch, module, handler, existing, result_key):
+    create = getattr(api, handler)
+
+    def reject_bad_passwords(query, data, server_id):
+        if data.get("password") == "not-valid":
+            raise ApiError(422, "The password format is invalid.")
+        return create(query, data, server_id)
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [(method, pattern, reject_bad_passwords if h == create else h) for method, pattern, h in api.routes],
+    )
+    args = dict(server_name=SERVER, base_url=api.base_url, api_key="key", api_secret="secret", id_cache_ttl=0, rate_limit=0)
+    users = [
+        dict(username="good_user", password="Secret123!"),
+        dict(username="bad_user", password="not-valid"),
+        dict(username=existing, state="absent"),
+    ]
+    result = run_module(module, dict(args, users=users), capsys)
+
+    assert result["failed"]
+    assert result["changed"]
+    assert result["errors"] == ["Failed to create %s bad_user: The password format is invalid." % (
+        "system user" if module == "runcloud_system_user" else "database user"
+    )]
+    assert [item["changed"] for item in result["data"][result_key]] == [True, False, True]
+
+    single = run_module(module, dict(args, username="bad_user", password="not-valid"), capsys)
+    assert single["failed"]
+    assert not single["changed"]
+    assert "The password format is invalid." in single["msg"]
+
+    duplicated = run_module(
+        module, dict(args, users=[dict(username="twice", password="Secret123!"), dict(username="twice", state="absent")]), capsys
+    )
+    assert duplicated["failed"]
+    assert duplicated["msg"] == "users lists twice more than once."
+
+
+@pytest.mark.parametrize(
+    "handler, message",
+    [
+        ("create_database", "Failed to create database new_db: The name has already been taken."),
+        ("grant", "Failed to grant database user"),
+    ],
+    ids=["create", "grant"],
+)
+def test_database_rejected_writes_fail_the_task(api, recorder, capsys, monkeypatch, handler, message):
+    rejected = getattr(api, handler)
+
+    def reject(*args):
+        raise ApiError(422, "The name has already been taken.")
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [(method, pattern, reject if h == rejected else h) for method, pattern, h in api.routes],
+    )
+    result = run_module(
+        "runcloud_database",
+        dict(
+            server_name=SERVER,
+            name="new_db",
+            collation="utf8mb4_unicode_ci",
+            users=["dbuser_1"],
+            base_url=api.base_url,
+            api_key="key",
+            api_secret="secret",
+            id_cache_ttl=0,
+            rate_limit=0,
+        ),
+        capsys,
+    )
+
+    assert result["failed"]
+    assert result["status"] == 422
+    assert result["msg"].startswith(message)
+    assert not [path for method, path in recorder.calls if "None" in path]
+
+
+@pytest.mark.parametrize("advanced", [False, True], ids=["webapp", "advanced"])
+def test_ssl_settings_drift_updates_in_place(api, recorder, capsys, advanced):
+    args = dict(
+        server_name=SERVER,
+        webapp_name=WEBAPP,
+        advanced=advanced,
+        base_url=api.base_url,
+        api_key="key",
+        api_secret="secret",
+        id_cache_ttl=0,
+        rate_limit=0,
+    )
+    assert run_module("runcloud_ssl", args, capsys)["changed"]
+
+    recorder.reset()
+    result = run_module("runcloud_ssl", dict(args, enable_hsts=True, protocol="TLSv1.3"), capsys)
+    assert result["changed"]
+    writes = set(method for method, path in recorder.calls if method != "GET")
+    assert writes == set(["PATCH"]), recorder.calls
+
+    recorder.reset()
+    result = run_module("runcloud_ssl", dict(args, enable_hsts=True, protocol="TLSv1.3", environment="staging"), capsys)
+    assert result["changed"]
+    writes = set(method for method, path in recorder.calls if method != "GET")
+    assert writes == set(["DELETE", "POST"]), recorder.calls
+
+
+def test_ssl_info_indexes_and_ssl_renew_renews_within_window(api, recorder, capsys):
+    credentials = dict(base_url=api.base_url, api_key="key", api_secret="secret", id_cache_ttl=0, rate_limit=0)
+    run_module("runcloud_ssl", dict(credentials, server_name=SERVER, webapp_name=WEBAPP), capsys)
+    run_module("runcloud_ssl", dict(credentials, server_name=SERVER, webapp_name="webapp-1", advanced=True), capsys)
+
+    result = run_module("runcloud_ssl_info", credentials, capsys)
+    assert not result["changed"]
+    certificates = result["data"]["certificates"]
+    installed = [certificate for certificate in certificates if certificate["installed"]]
+    assert len(certificates) == FLEET_SIZE + 1
+    assert certificates[:len(installed)] == installed
+    assert sorted((c["webapp_name"], c["domain_name"]) for c in installed) == [
+        ("webapp-1", "webapp-1-0.example.com"),
+        ("webapp-1", "webapp-1-1.example.com"),
+        (WEBAPP, None),
+    ]
+
+    recorder.reset()
+    result = run_module("runcloud_ssl_renew", credentials, capsys)
+    assert not result["changed"]
+    assert not [call for call in recorder.calls if call[0] != "GET"]
+
+    result = run_module("runcloud_ssl_renew", dict(credentials, renew_within_days=100000), capsys)
+    assert result["changed"]
+    assert len(result["data"]["renewed"]) == 3
+    renewed_ids = set(certificate["ssl_id"] for certificate in result["data"]["renewed"])
+    assert renewed_ids.isdisjoint(certificate["ssl_id"] for certificate in installed)
+
+
+@pytest.mark.parametrize("connect_polls, wait_timeout, connected", [(3, 60, True), (50, 1, False)], ids=["connects", "times-out"])
+def test_server_waits_for_connection(recorder, capsys, monkeypatch, connect_polls, wait_timeout, connected):
+    monkeypatch.setattr(RunCloudHelper, "poll_base_delay", 0.01)
+    monkeypatch.setattr(RunCloudHelper, "poll_max_delay", 0.05)
+    with MockRunCloudAPI(Fleet(), connect_polls=connect_polls) as mock_api:
+        result = run_module(
+            "runcloud_server",
+            dict(
+                name="new-server",
+                ip_address="192.0.2.10",
+                php_version="8.1",
+                wait_timeout=wait_timeout,
+                base_url=mock_api.base_url,
+                api_key="key",
+                api_secret="secret",
+                id_cache_ttl=0,
+                rate_limit=0,
+            ),
+            capsys,
+        )
+
+    assert bool(result.get("failed")) != connected, result.get("msg")
+    assert result["data"]["server"]["connected"] == connected
+    polls = recorder.calls.count(("GET", "servers/{id}"))
+    if connected:
+        assert polls >= connect_polls
+    else:
+        assert polls < connect_polls
+
+
+@pytest.mark.parametrize("status, connected", [(502, True), (404, False)], ids=["server-error", "client-error"])
+def test_server_wait_survives_server_errors_and_stops_on_client_errors(recorder, capsys, monkeypatch, status, connected):
+    monkeypatch.setattr(RunCloudHelper, "poll_base_delay", 0.01)
+    monkeypatch.setattr(RunCloudHelper, "poll_max_delay", 0.05)
+    with MockRunCloudAPI(Fleet(), connect_polls=1) as mock_api:
+        get_server = mock_api.get_server
+        polls = []
+
+        def flaky_get_server(*args):
+            polls.append(args)
+            if len(polls) == 1:
+                raise ApiError(status, "Unavailable")
+            return get_server(*args)
+
+        monkeypatch.setattr(
+            mock_api,
+            "routes",
+            [
+                (method, pattern, flaky_get_server if handler == get_server else handler)
+                for method, pattern, handler in mock_api.routes
+            ],
+        )
+        result = run_module(
+            "runcloud_server",
+            dict(
+                name="new-server",
+                ip_address="192.0.2.10",
+                php_version="8.1",
+                base_url=mock_api.base_url,
+                api_key="key",
+                api_secret="secret",
+                id_cache_ttl=0,
+                rate_limit=0,
+                retries=0,
+            ),
+            capsys,
+        )
+
+    assert bool(result.get("failed")) != connected, result.get("msg")
+    if connected:
+        assert result["data"]["server"]["connected"]
+    else:
+        assert result["msg"] == "Failed to poll 1 of 1 paths."
+        assert [error.split(": ")[1] for error in result["errors"]] == ["Unavailable"]
+        assert len(polls) == 1
+
+
+def test_servers_wait_fails_once_for_every_rejected_poll(recorder, capsys, monkeypatch):
+    def gone(*args):
+        raise ApiError(404, "Server not found.")
+
+    servers = [dict(name="new-server-%s" % i, ip_address="192.0.2.%s" % (20 + i)) for i in range(4)]
+    with MockRunCloudAPI(Fleet(), connect_polls=3) as mock_api:
+        args = dict(
+            servers=servers,
+            php_version="8.1",
+            base_url=mock_api.base_url,
+            api_key="key",
+            api_secret="secret",
+            id_cache_ttl=0,
+            rate_limit=0,
+        )
+        run_module("runcloud_server", dict(args, wait=False), capsys)
+        monkeypatch.setattr(
+            mock_api,
+            "routes",
+            [
+                (method, pattern, gone if handler == mock_api.get_server else handler)
+                for method, pattern, handler in mock_api.routes
+            ],
+        )
+        recorder.reset()
+        # run_module parses stdout as a single JSON document.
+        result = run_module("runcloud_server", args, capsys)
+
+    assert result["failed"]
+    assert result["msg"] == "Failed to poll 4 of 4 paths."
+    assert len(result["errors"]) == 4
+    assert recorder.calls.count(("GET", "servers/{id}")) == 4
+
+
+def test_server_is_not_registered_again_when_the_listing_fails(api, recorder, capsys, monkeypatch):
+    def unavailable(*args):
+        raise ApiError(503, "Service Unavailable")
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [(method, pattern, unavailable if h == api.list_servers else h) for method, pattern, h in api.routes],
+    )
+    result = run_module(
+        "runcloud_server",
+        dict(
+            name=SERVER,
+            ip_address=api.fleet.servers[max(api.fleet.servers)]["ipAddress"],
+            php_version="8.1",
+            retries=0,
+            base_url=api.base_url,
+            api_key="key",
+            api_secret="secret",
+            id_cache_ttl=0,
+            rate_limit=0,
+        ),
+        capsys,
+    )
+
+    assert result["failed"]
+    assert result["status"] == 503
+    assert ("POST", "servers") not in recorder.calls
+
+
+def test_server_patches_only_changed_settings_groups(api, recorder, capsys):
+    args = dict(
+        name=SERVER,
+        ip_address=api.fleet.servers[max(api.fleet.servers)]["ipAddress"],
+        php_version="8.1",
+        base_url=api.base_url,
+        api_key="key",
+        api_secret="secret",
+        id_cache_ttl=0,
+        rate_limit=0,
+    )
+    run_module("runcloud_server", args, capsys)
+
+    recorder.reset()
+    result = run_module("runcloud_server", dict(args, security_update=False, use_dns=True), capsys)
+    assert result["changed"]
+    assert result["data"]["server"]["securityUpdate"] is False
+    assert sorted(call for call in recorder.calls if call[0] != "GET") == [
+        ("PATCH", "servers/{id}/settings/autoupdate"),
+        ("PATCH", "servers/{id}/settings/ssh"),
+    ]
+    assert ("GET", "servers/{id}") not in recorder.calls
+
+
+@pytest.mark.parametrize("count", [1, 3], ids=["single", "bulk"])
+def test_server_rejected_settings_updates_fail_the_task_once(api, capsys, monkeypatch, count):
+    def reject(*args):
+        raise ApiError(422, "The selected php version is invalid.")
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [
+            (method, pattern, reject if pattern.pattern.endswith("/php/cli$") else handler)
+            for method, pattern, handler in api.routes
+        ],
+    )
+    servers = [
+        dict(name=api.fleet.servers[server_id]["name"], ip_address=api.fleet.servers[server_id]["ipAddress"])
+        for server_id in sorted(api.fleet.servers)[-count:]
+    ]
+    args = dict(
+        php_version="8.2",
+        security_update=False,
+        base_url=api.base_url,
+        api_key="key",
+        api_secret="secret",
+        id_cache_ttl=0,
+        rate_limit=0,
+    )
+    if count == 1:
+        args.update(servers[0])
+    else:
+        args.update(servers=servers)
+    # run_module parses stdout as a single JSON document.
+    result = run_module("runcloud_server", args, capsys)
+
+    assert result.get("failed")
+    assert result["errors"] == [
+        "Failed to update php/cli of server %s: The selected php version is invalid." % server["name"]
+        for server in servers
+    ]
+    # The autoupdate groups were still written and show in the servers.
+    written = [result["data"]["server"]] if count == 1 else [item["server"] for item in result["data"]["servers"]]
+    assert all(server["securityUpdate"] is False for server in written)
+
+
+def test_servers_return_scripts_and_wait_together(recorder, capsys, monkeypatch):
+    monkeypatch.setattr(RunCloudHelper, "poll_base_delay", 0.01)
+    monkeypatch.setattr(RunCloudHelper, "poll_max_delay", 0.05)
+
+    def run_command(*args, **kwargs):
+        raise AssertionError("installation scripts must not run on the task's host")
+
+    monkeypatch.setattr(AnsibleModule, "run_command", run_command)
+    servers = [dict(name="new-server-%s" % i, ip_address="192.0.2.%s" % (20 + i), php_version="8.2") for i in range(6)]
+    with MockRunCloudAPI(Fleet(), connect_polls=3) as mock_api:
+        args = dict(
+            servers=servers,
+            php_version="8.1",
+            concurrency=6,
+            base_url=mock_api.base_url,
+            api_key="key",
+            api_secret="secret",
+            id_cache_ttl=0,
+            rate_limit=0,
+        )
+        # Servers registered by the task are not waited for, even with
+        # the default wait=true.
+        registered = run_module("runcloud_server", args, capsys)
+        recorder.reset()
+        result = run_module("runcloud_server", args, capsys)
+        rejected = run_module("runcloud_server", dict(args, install_script=True), capsys)
+
+    assert not registered.get("failed"), registered.get("msg")
+    assert registered["changed"]
+    assert all(server["script"] == "true" for server in registered["data"]["servers"])
+    assert not any(server["server"]["connected"] for server in registered["data"]["servers"])
+
+    assert not result.get("failed"), result.get("msg")
+    assert [server["name"] for server in result["data"]["servers"]] == [server["name"] for server in servers]
+    assert all(server["server"]["connected"] for server in result["data"]["servers"])
+    assert all(server["server"]["phpCLIVersion"] == "php82rc" for server in result["data"]["servers"])
+    assert not any("script" in server for server in result["data"]["servers"])
+    # Every round polls all the servers that are still connecting.
+    assert recorder.calls.count(("GET", "servers/{id}")) == 3 * len(servers)
+    assert ("GET", "servers/{id}/installationscript") not in recorder.calls
+
+    assert rejected.get("failed")
+    assert "install_script" in rejected["msg"]
+
+
+@pytest.mark.parametrize("advanced", [False, True], ids=["webapp", "advanced"])
+def test_ssl_not_installed_message_is_honoured_on_success_status(recorder, capsys, advanced):
+    with MockRunCloudAPI(Fleet.synthetic(servers=1, webapps=1, domains=2), missing_ssl_status=200) as mock_api:
+        args = dict(
+            server_name="server-1",
+            webapp_name="webapp-1",
+            advanced=advanced,
+            base_url=mock_api.base_url,
+            api_key="key",
+            api_secret="secret",
+            id_cache_ttl=0,
+            rate_limit=0,
+        )
+        result = run_module("runcloud_ssl", args, capsys)
+
+    assert result["changed"], result.get("msg")
+    writes = set(call for call in recorder.calls if call[0] != "GET")
+    assert not [call for call in writes if call[0] == "PATCH"], writes
+    assert any(method == "POST" and path.endswith("/ssl") for method, path in writes)
+
+
+def test_ssl_failed_update_fails_the_task(api, capsys, monkeypatch):
+    args = dict(
+        server_name=SERVER,
+        webapp_name=WEBAPP,
+        base_url=api.base_url,
+        api_key="key",
+        api_secret="secret",
+        id_cache_ttl=0,
+        rate_limit=0,
+    )
+    run_module("runcloud_ssl", args, capsys)
+
+    def reject(*args):
+        raise ApiError(422, "The selected ssl protocol id is invalid.")
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [(method, pattern, reject if method == "PATCH" else handler) for method, pattern, handler in api.routes],
+    )
+    result = run_module("runcloud_ssl", dict(args, protocol="TLSv1.3"), capsys)
+    assert result.get("failed")
+    assert result["msg"] == "Failed to update SSL: The selected ssl protocol id is invalid."
+
+
+def test_ssl_failures_on_several_domains_fail_the_task_once(capsys, monkeypatch):
+    def reject(*args):
+        raise ApiError(422, "Too many certificates already issued.")
+
+    with MockRunCloudAPI(Fleet.synthetic(servers=1, webapps=1, domains=4)) as mock_api:
+        monkeypatch.setattr(
+            mock_api,
+            "routes",
+            [
+                (method, pattern, reject if method == "POST" and pattern.pattern.endswith("/ssl$") else handler)
+                for method, pattern, handler in mock_api.routes
+            ],
+        )
+        # run_module parses stdout as a single JSON document.
+        result = run_module(
+            "runcloud_ssl",
+            dict(
+                server_name="server-1",
+                webapp_name="webapp-1",
+                advanced=True,
+                base_url=mock_api.base_url,
+                api_key="key",
+                api_secret="secret",
+                id_cache_ttl=0,
+                rate_limit=0,
+            ),
+            capsys,
+        )
+
+    assert result["failed"]
+    assert result["status"] == 422
+    assert "Too many certificates already issued." in result["msg"]
+
+
+def test_ssl_info_fails_once_for_every_certificate_it_cannot_get(api, capsys, monkeypatch):
+    def forbidden(*args):
+        raise ApiError(403, "This action is unauthorized.")
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [(method, pattern, forbidden if handler == api.get_ssl else handler) for method, pattern, handler in api.routes],
+    )
+    result = run_module(
+        "runcloud_ssl_info",
+        dict(base_url=api.base_url, api_key="key", api_secret="secret", id_cache_ttl=0, rate_limit=0),
+        capsys,
+    )
+
+    assert result["failed"]
+    assert result["msg"] == "Failed to get %s of %s certificates." % (FLEET_SIZE, FLEET_SIZE)
+    assert all("This action is unauthorized." in error for error in result["errors"])
+
+
+def test_ssl_renew_reports_failed_renewals(api, capsys, monkeypatch):
+    credentials = dict(base_url=api.base_url, api_key="key", api_secret="secret", id_cache_ttl=0, rate_limit=0)
+    run_module("runcloud_ssl", dict(credentials, server_name=SERVER, webapp_name=WEBAPP), capsys)
+    run_module("runcloud_ssl", dict(credentials, server_name=SERVER, webapp_name="webapp-1"), capsys)
+
+    install_ssl = api.install_ssl
+
+    def install_fails_for_webapp_1(query, data, server_id, webapp_id):
+        if api.fleet.webapps[server_id][webapp_id]["name"] == "webapp-1":
+            raise ApiError(422, "Too many certificates already issued.")
+        return install_ssl(query, data, server_id, webapp_id)
+
+    monkeypatch.setattr(
+        api,
+        "routes",
+        [
+            (method, pattern, install_fails_for_webapp_1 if handler == install_ssl else handler)
+            for method, pattern, handler in api.routes
+        ],
+    )
+    result = run_module("runcloud_ssl_renew", dict(credentials, renew_within_days=100000), capsys)
+
+    assert result["failed"]
+    assert result["changed"]
+    assert [certificate["webapp_name"] for certificate in result["data"]["renewed"]] == [WEBAPP]
+    failed = result["data"]["failed"]
+    assert [certificate["webapp_name"] for certificate in failed] == ["webapp-1"]
+    assert not failed[0]["installed"]
+    assert "Too many certificates already issued." in failed[0]["error"]
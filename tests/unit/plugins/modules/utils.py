@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import importlib
+import json
+
+import pytest
+from ansible.module_utils import basic
+from ansible.module_utils._text import to_bytes
+from ansible_collections.danni140c.runcloud.plugins.module_utils.runcloud import (
+    ApiStats,
+    RunCloudHelper,
+)
+
+
+def set_module_args(args):
+    basic._ANSIBLE_ARGS = to_bytes(json.dumps(dict(ANSIBLE_MODULE_ARGS=args)))
+    if hasattr(basic, "_ANSIBLE_PROFILE"):
+        basic._ANSIBLE_PROFILE = "legacy"
+
+
+class ApiCallRecorder(object):
+    """
+    Wraps RunCloudHelper.send and records (method, path template) for
+    every call the module makes.
+    """
+
+    def __init__(self, monkeypatch):
+        self.calls = []
+        send = RunCloudHelper.send
+        recorder = self
+
+        def recording_send(helper, method, path, *args, **kwargs):
+            recorder.calls.append((method, ApiStats.path_template(path)))
+            return send(helper, method, path, *args, **kwargs)
+
+        monkeypatch.setattr(RunCloudHelper, "send", recording_send)
+
+    def reset(self):
+        self.calls = []
+
+
+def run_module(name, args, capsys):
+    """
+    Run a module in-process and return its JSON result.
+    """
+    module = importlib.import_module("ansible_collections.danni140c.runcloud.plugins.modules.%s" % name)
+    set_module_args(args)
+    with pytest.raises(SystemExit):
+        module.main()
+    return json.loads(capsys.readouterr().out)
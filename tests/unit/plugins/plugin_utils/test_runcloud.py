@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright: Daniel Rasmussen (@danni140c)
+# GNU General Public License v3.0+ (see COPYING or https://www.gnu.org/licenses/gpl-3.0.txt)
+
+from __future__ import absolute_import, division, print_function
+
+__metaclass__ = type
+
+import os
+
+from ansible_collections.danni140c.runcloud.plugins.plugin_utils.runcloud import (
+    run_module,
+)
+
+from mock_runcloud_api import Fleet, MockRunCloudAPI
+
+
+def test_modules_see_the_task_environment(monkeypatch, tmp_path):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("RC_API_SECRET", "outer-secret")
+    for variable in ("RC_API_KEY", "RUNCLOUD_API_KEY", "RUNCLOUD_API_SECRET"):
+        monkeypatch.delenv(variable, raising=False)
+
+    with MockRunCloudAPI(Fleet.synthetic(servers=1)) as api:
+        args = dict(
+            server_name="server-1",
+            username="new-user",
+            password="Secret123!",
+            base_url=api.base_url,
+            id_cache_ttl=0,
+            rate_limit=0,
+        )
+        without_credentials = run_module("runcloud_system_user", args)
+        result = run_module(
+            "runcloud_system_user", args, environment=dict(RC_API_KEY="key", RC_API_SECRET="secret")
+        )
+
+    assert without_credentials["failed"]
+    assert not result.get("failed"), result.get("msg")
+    assert result["changed"]
+    assert "RC_API_KEY" not in os.environ
+    assert os.environ["RC_API_SECRET"] == "outer-secret"